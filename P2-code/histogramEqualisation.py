@@ -1,28 +1,22 @@
+import os
 import sys
 import cv2 as cv
 import numpy as np
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # pipeline.py is in the parent directory
+from pipeline import runPipeline
 
 '''
 To normalize different lighting conditions, perform histogram equalization
 on each chanel of the images
-'''
-
-#stemfile="lung.jpg"
-for i in range(1,2):
-#    file='national-cancer-institute.jpg'
-#    file='43601.jpg'
-#    file=stemfile[:-4]+str(i)+stemfile[-4:]
-    file='lung.jpg'
-    img=cv.imread(file)                    # convert file to image tensor
 
-    if img is None:
-        sys.exit("Could not read the image "+file)
+command line arguments : file names of color images, default lung.jpg
+Files are read, equalized and written in a pipeline (pipeline.py), so writing the bmp files of one image overlaps
+equalizing the next one.
+'''
 
+def equalize(file,img):
     b,g,r=img[:,:,0],img[:,:,1],img[:,:,2] # split into blue, green, red
-    cv.imwrite(file[:-4]+'_b.bmp',b)
-    cv.imwrite(file[:-4]+'_g.bmp',g)
-    cv.imwrite(file[:-4]+'_r.bmp',r)
 
     bequ=cv.equalizeHist(b)                # equalize histogram of blue chanel 
     gequ=cv.equalizeHist(g)                # green chanel
@@ -30,7 +24,15 @@ for i in range(1,2):
 
     imgequ=np.dstack([bequ,gequ,requ])     # join histogram equalized chanels to image tensor
 
-    cv.imwrite(file[:-4]+'_HE.bmp',imgequ) # output image name extended to _HE
-    cv.imwrite(file[:-4]+'_HE_b.bmp',bequ)
-    cv.imwrite(file[:-4]+'_HE_r.bmp',requ)
-    cv.imwrite(file[:-4]+'_HE_g.bmp',gequ)
+    return [(file[:-4]+'_b.bmp',b),
+            (file[:-4]+'_g.bmp',g),
+            (file[:-4]+'_r.bmp',r),
+            (file[:-4]+'_HE.bmp',imgequ),  # output image name extended to _HE
+            (file[:-4]+'_HE_b.bmp',bequ),
+            (file[:-4]+'_HE_r.bmp',requ),
+            (file[:-4]+'_HE_g.bmp',gequ)]
+
+if __name__=='__main__':
+#    files=['national-cancer-institute.jpg','43601.jpg']
+    files=sys.argv[1:] or ['lung.jpg']
+    runPipeline(files,equalize)            # convert files to image tensors, equalize, write
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sys
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from histogram import computeHistogram
+
+'''
+Tiled adaptive histogram equalization with contrast limiting (CLAHE), for local contrast normalization of
+large images.
+
+The image is divided in a grid of tiles. Each tile gets its own equalization look up table from its histogram,
+clipped at clipLimit times the average bin count, with the clipped pixels redistributed to all bins, so noise in
+flat regions is not amplified. Each output pixel is the bilinear interpolation of the tables of the four tiles whose
+centres surround it, so there are no visible tile borders.
+
+Histograms are computed one row of tiles at a time and the output is created in horizontal strips of rows, both in
+parallel threads (numpy releases the GIL), so memory stays bounded by a few strips even for gigapixel images read
+with readP5file.mapfile and written to a memmap.
+'''
+
+'''
+Start positions of n almost equal parts of length size, with size at the end
+'''
+def _edges(size,n):
+    return np.linspace(0,size,n+1).astype(int)
+
+'''
+Equalization look up table of one tile from its histogram
+'''
+def _tileLUT(hist,clipLimit,maxGray):
+    hist=hist.astype(np.float64)
+    total=hist.sum()
+    if total==0:
+        return np.arange(maxGray+1,dtype=np.float32)
+    if clipLimit>0:
+        limit=max(1.0,clipLimit*total/len(hist))   # clipLimit times the average count of a bin
+        excess=np.maximum(hist-limit,0).sum()
+        hist=np.minimum(hist,limit)+excess/len(hist) # redistribute clipped pixels to all bins
+    cdf=np.cumsum(hist)
+    return (cdf*(maxGray/total)).astype(np.float32)
+
+'''
+Look up tables of all tiles
+Inputs: img       : 2-D gray image, 8-bit or 16-bit (can be a memmap)
+        tiles     : (number of tile rows, number of tile columns), default (8,8)
+        clipLimit : histogram bins are clipped at clipLimit times the average bin count, 0 for no clipping.
+                    Default 2.0
+        maxGray   : maximum intensity possible, default 255 for 8-bit and 65535 for 16-bit images
+        workers   : number of threads, default number of processors
+Output: tile rows x tile columns x (maxGray+1) float32 array of look up tables
+'''
+def tileLUTs(img,tiles=(8,8),clipLimit=2.0,maxGray=None,workers=None):
+    if maxGray is None:
+        maxGray=65535 if img.dtype.itemsize>1 else 255
+    rows,columns=img.shape
+    rowEdges=_edges(rows,tiles[0])
+    colEdges=_edges(columns,tiles[1])
+
+    def tileRow(i):                                 # tables of one row of tiles, reads only the rows of these tiles
+        band=np.asarray(img[rowEdges[i]:rowEdges[i+1]])
+        return [_tileLUT(computeHistogram(band[:,colEdges[j]:colEdges[j+1]],maxGray),clipLimit,maxGray) for j in range(tiles[1])]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return np.array(list(executor.map(tileRow,range(tiles[0]))),dtype=np.float32)
+
+'''
+For each position 0 to size-1: index of the tile centre before it, index of the tile centre after it, and weight of the
+tile after it for linear interpolation. Positions before the first or after the last centre use that tile only.
+'''
+def _interpolation(size,n):
+    edges=_edges(size,n)
+    centres=(edges[:-1]+edges[1:]-1)/2
+    pos=np.arange(size)
+    i0=np.clip(np.searchsorted(centres,pos,side='right')-1,0,n-1)
+    i1=np.minimum(i0+1,n-1)
+    span=centres[i1]-centres[i0]
+    w=np.where(span>0,(pos-centres[i0])/np.where(span>0,span,1),0)
+    return i0,i1,np.clip(w,0,1).astype(np.float32)
+
+'''
+Adaptive histogram equalization of a gray image
+Inputs: img       : 2-D gray image, 8-bit or 16-bit (can be a memmap)
+        tiles     : (number of tile rows, number of tile columns), default (8,8)
+        clipLimit : contrast limit, see tileLUTs. Default 2.0
+        maxGray   : maximum intensity possible, default 255 for 8-bit and 65535 for 16-bit images
+        out       : optional preallocated output matrix (or memmap) of the shape and dtype of img
+        stripRows : number of rows interpolated at once, default 256
+        workers   : number of threads, default number of processors
+Output: equalized image
+'''
+def equalizeAdaptive(img,tiles=(8,8),clipLimit=2.0,maxGray=None,out=None,stripRows=256,workers=None):
+    img=np.asarray(img) if not isinstance(img,np.memmap) else img
+    if img.ndim!=2 or img.dtype.kind!='u' or img.dtype.itemsize>2:
+        sys.exit("adaptive equalization needs a 2-D 8-bit or 16-bit gray image")
+    if maxGray is None:
+        maxGray=65535 if img.dtype.itemsize>1 else 255
+    rows,columns=img.shape
+    tiles=(min(tiles[0],rows),min(tiles[1],columns))
+    if out is None:
+        out=np.empty(img.shape,dtype=img.dtype)
+
+    luts=tileLUTs(img,tiles,clipLimit,maxGray,workers).reshape(-1)  # flat: table of tile (i,j) starts at (i*tiles[1]+j)*L
+    L=maxGray+1
+    r0,r1,wy=_interpolation(rows,tiles[0])
+    c0,c1,wx=_interpolation(columns,tiles[1])
+    c0=c0*L                                          # offsets of the tables of tile columns
+    c1=c1*L
+
+    def strip(start):                                # interpolate rows start to start+stripRows
+        end=min(start+stripRows,rows)
+        A=np.asarray(img[start:end]).astype(np.intp)
+        top=(r0[start:end]*tiles[1]*L)[:,None]+A     # table index of the tile row above, without column offset
+        bottom=(r1[start:end]*tiles[1]*L)[:,None]+A
+        upper=luts[top+c0]*(1-wx)+luts[top+c1]*wx    # interpolate between tile columns ...
+        lower=luts[bottom+c0]*(1-wx)+luts[bottom+c1]*wx
+        v=wy[start:end,None]
+        result=upper*(1-v)+lower*v                   # ... then between tile rows
+        out[start:end]=np.clip(np.round(result),0,maxGray)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(strip,range(0,rows,stripRows)))
+    return out
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor,as_completed
+
+from pgmImage import PGMImage
+from threshold import selectThresholds,segmentAll
+from matrix_to_binary import creatBinaryeFile
+
+'''
+Batch driver for segmentation (imageSegmentation.py) and ASCII to binary conversion (convert_pgm_ASCII_to_binary.py)
+of many pgm files, in parallel worker processes.
+
+Usage: batchSegmentation.py [-t segment|convert] [-o output_dir] [-j workers] [-c mtime|hash|none] input [input ...]
+       input : a directory (all .pgm files in it), a glob pattern such as 'scans/*.pgm',
+               or @file, a manifest with one input file name per line
+       -c    : skip input files that were already processed. mtime -> all outputs are newer than the input,
+               hash -> all outputs exist and the input content is unchanged since the last run. Default mtime.
+At the end, number of processed, skipped and failed files, and throughput in images/s and MB/s are reported.
+'''
+
+hashFile='.batch_hashes.json'  # input hashes of processed files, kept in the output directory
+segmentNames=('half','mom','Otsu') # thresholds of the segmented outputs, in the order of segmentAll
+
+'''
+Expand directories, glob patterns and @manifest files to a sorted list of input files
+Outputs of this driver are left out, so a rerun over a directory that also holds the outputs (e.g. the default
+output directory '.') does not process them again: for segment, files named like '<name>_segmented half.pgm',
+for convert, files whose output would be the file itself.
+'''
+def collectInputs(inputs,task='segment',outdir=None):
+    files=[]
+    for item in inputs:
+        if item.startswith('@'):                       # manifest with one file name per line
+            with open(item[1:]) as f:
+                files.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+        elif os.path.isdir(item):
+            files.extend(glob.glob(os.path.join(item,'*.pgm')))
+        else:
+            files.extend(glob.glob(item) or [item])
+    return sorted(set(f for f in files if not isOutput(task,f,outdir)))
+
+'''
+Names of the output files of one input file, same names as imageSegmentation.py and convert_pgm_ASCII_to_binary.py
+'''
+def outputNames(task,filename,outdir):
+    base,xtn=os.path.splitext(os.path.basename(filename))
+    if task=='convert':
+        if base.endswith('_ASCII'):
+            base=base[:-6]
+        return [os.path.join(outdir,base+xtn)]
+    return [os.path.join(outdir,base+'_segmented '+name+xtn) for name in segmentNames]
+
+'''
+True if filename is an output of the task, by its name (segment) or because it would be written over itself (convert)
+'''
+def isOutput(task,filename,outdir=None):
+    base=os.path.splitext(os.path.basename(filename))[0]
+    if task=='convert':
+        return outdir is not None and os.path.abspath(outputNames(task,filename,outdir)[0])==os.path.abspath(filename)
+    return any(base.endswith('_segmented '+name) for name in segmentNames)
+
+def fileHash(filename):
+    h=hashlib.sha1()
+    with open(filename,'rb') as f:
+        for block in iter(lambda: f.read(1<<20),b''):
+            h.update(block)
+    return h.hexdigest()
+
+'''
+Decide in the main process if an input file was already processed, with the mtime check.
+With the hash check the input has to be read, which is done in the worker (see processFile), so False is returned.
+A missing input is not done, its worker reports it as failed.
+'''
+def isDone(check,filename,outputs):
+    if check in ('none','hash') or not all(os.path.exists(o) for o in outputs):
+        return False
+    try:
+        mtime=os.path.getmtime(filename)
+        return all(os.path.getmtime(o)>=mtime for o in outputs)
+    except OSError:
+        return False
+
+'''
+Process one file in a worker process
+Inputs: task, filename, outputs : as in the main program
+        check   : 'hash' to hash the input in the worker, so hashing runs in parallel and each file is hashed once
+        oldHash : hash of the input stored by the last run, None if unknown or if an output is missing.
+                  The file is not processed again if its hash is unchanged.
+Output: size of the input file in bytes, its hash (None if check is not 'hash'), True if processed or False if skipped
+'''
+def processFile(task,filename,outputs,check='mtime',oldHash=None):
+    digest=fileHash(filename) if check=='hash' else None
+    if digest is not None and digest==oldHash:
+        return os.path.getsize(filename),digest,False
+    img=PGMImage.fromFile(filename)
+    if task=='convert':
+        img.writeBinary(outputs[0])
+    else:
+        T=selectThresholds(img.hist,img.maxGray)       # thresholds L/2, mean of means and Otsu from one histogram
+        SA=segmentAll(img.A,[T['half'],T['mom'],T['otsu']])
+        for i in range(len(outputs)):
+            creatBinaryeFile(outputs[i],SA[i],img.rows,img.columns,255)
+    return os.path.getsize(filename),digest,True
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Segment or convert many pgm files in parallel')
+    parser.add_argument('inputs',nargs='+',help='directories, glob patterns or @manifest files')
+    parser.add_argument('-t','--task',choices=['segment','convert'],default='segment')
+    parser.add_argument('-o','--output',default='.',help='output directory, default current directory')
+    parser.add_argument('-j','--workers',type=int,default=os.cpu_count(),help='number of worker processes')
+    parser.add_argument('-c','--check',choices=['mtime','hash','none'],default='mtime',help='how to skip files already processed')
+    args=parser.parse_args()
+
+    files=collectInputs(args.inputs,args.task,args.output)
+    if not files:
+        sys.exit("No input files found")
+    os.makedirs(args.output,exist_ok=True)
+
+    hashPath=os.path.join(args.output,hashFile)
+    hashes={}
+    if args.check=='hash' and os.path.exists(hashPath):
+        with open(hashPath) as f:
+            hashes=json.load(f)
+
+    start=time.perf_counter()
+    done=failed=skipped=nbytes=0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures={}
+        for filename in files:
+            outputs=outputNames(args.task,filename,args.output)
+            if isDone(args.check,filename,outputs):
+                skipped+=1
+                continue
+            oldHash=None
+            if args.check=='hash' and all(os.path.exists(o) for o in outputs):
+                oldHash=hashes.get(os.path.abspath(filename))
+            futures[executor.submit(processFile,args.task,filename,outputs,args.check,oldHash)]=filename
+
+        for future in as_completed(futures):
+            filename=futures[future]
+            try:
+                size,digest,processed=future.result()
+            except BaseException as e:                 # a bad file calls sys.exit in the readers, continue with others
+                failed+=1
+                print(filename,': failed -',e)
+                continue
+            if digest is not None:
+                hashes[os.path.abspath(filename)]=digest
+            if not processed:
+                skipped+=1
+                continue
+            done+=1
+            nbytes+=size
+
+    if args.check=='hash':
+        with open(hashPath,'w') as f:
+            json.dump(hashes,f,indent=1)
+
+    elapsed=time.perf_counter()-start
+    print("processed %d, skipped %d, failed %d files in %.2f s" %(done,skipped,failed,elapsed))
+    if done and elapsed>0:
+        print("throughput: %.1f images/s, %.1f MB/s" %(done/elapsed,nbytes/2**20/elapsed))
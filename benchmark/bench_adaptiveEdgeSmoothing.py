@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'enhancement')) # run from any directory
+
+from adaptiveEdgeSmoothingOpenCV import adaptiveEdgeSmoothing,adaptiveEdgeSmoothing_old
+
+'''
+Benchmark of the vectorized adaptive edge smoothing against the earlier pixel by pixel loop.
+Usage: bench_adaptiveEdgeSmoothing.py [size ...]  -> square synthetic 8-bit images of the given sizes, default 1024 4096
+The pixel loop takes minutes on large images, so it is timed only up to 1024 x 1024.
+'''
+oldMaxSize=1024
+ksizes=[3,5,9]
+
+if __name__=='__main__':
+    sizes=[int(s) for s in sys.argv[1:]] or [1024,4096]
+
+    for size in sizes:
+        img=np.random.randint(0,256,(size,size),dtype=np.uint8)
+        for ksize in ksizes:
+            start=time.perf_counter()
+            oimg,meanMap=adaptiveEdgeSmoothing(img,ksize)
+            new=time.perf_counter()-start
+
+            line="%dx%d ksize %d: adaptiveEdgeSmoothing %.3f s" %(size,size,ksize,new)
+            if size<=oldMaxSize:
+                start=time.perf_counter()
+                oimg_old,meanMap=adaptiveEdgeSmoothing_old(img,ksize)
+                old=time.perf_counter()-start
+                if not np.array_equal(oimg,oimg_old):
+                    sys.exit("adaptiveEdgeSmoothing differs from adaptiveEdgeSmoothing_old")
+                line+=", adaptiveEdgeSmoothing_old %.3f s, speedup %.0fx" %(old,old/new)
+            print(line)
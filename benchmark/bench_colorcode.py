@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # run from any directory
+
+from transform import colorcode as cl
+
+'''
+Benchmark of the tiled color conversions against the earlier whole-image code.
+Usage: bench_colorcode.py [size ...]  -> square synthetic 8-bit color images of the given sizes, default 1024 4096
+For every conversion: time of the _old version and the tiled version, and the largest and 99th percentile absolute
+difference of each channel from the _old version.
+Pixels where the _old version is not finite (float16 overflow, black pixels) or has no defined hue (gray pixels) are not
+compared.
+'''
+
+'''
+Largest and 99th percentile absolute difference of each channel, over pixels of img that are not gray and where
+reference is finite
+'''
+def errors(result,reference,img):
+    ok=np.isfinite(reference).all(axis=2)&((img[...,0]!=img[...,1])|(img[...,1]!=img[...,2]))
+    diff=np.abs(result.astype(np.float64)-reference)[ok]
+    return ' '.join("%.3g/%.3g" %(d.max(),np.percentile(d,99)) for d in diff.T) if len(diff) else '-'
+
+def timed(f,*args,**kwargs):
+    start=time.perf_counter()
+    result=f(*args,**kwargs)
+    return result,time.perf_counter()-start
+
+if __name__=='__main__':
+    sizes=[int(s) for s in sys.argv[1:]] or [1024,4096]
+    warnings.simplefilter('ignore')                       # the _old versions divide by 0 on black and gray pixels
+
+    for conversion,new,old in [('HSI',cl.RGB2HSI,cl.RGB2HSI_old),('CMYK',cl.RGB2CMYK,cl.RGB2CMYK_old)]:
+        for size in sizes:
+            img=np.random.randint(0,256,(size,size,3),dtype=np.uint8)
+            reference,tOld=timed(old,img)
+            result,tNew=timed(new,img)
+            print("RGB2%s %dx%d: _old %.3f s, tiled %.3f s (%.1fx), max/99%% error per channel %s"
+                  %(conversion,size,size,tOld,tNew,tOld/tNew,errors(result,reference,img)))
+
+    for size in sizes:
+        img=np.random.randint(0,256,(size,size,3),dtype=np.uint8)
+        hsi=cl.RGB2HSI(img)
+        rgb,tNew=timed(cl.HSI2RGB,hsi)
+        rgbOld,tOld=timed(cl.HSI2RGB_old,hsi.astype(np.float64))
+        cmyk=cl.RGB2CMYK(img)
+        back,tNewK=timed(cl.CMYK2RGB,cmyk)
+        backOld,tOldK=timed(cl.CMYK2RGB_old,cmyk.astype(np.float64))
+        print("HSI2RGB %dx%d: _old %.3f s, tiled %.3f s (%.1fx), round trip max error %d"
+              %(size,size,tOld,tNew,tOld/tNew,np.abs(rgb.astype(int)-img).max()))
+        print("CMYK2RGB %dx%d: _old %.3f s, tiled %.3f s (%.1fx), round trip max error %d"
+              %(size,size,tOldK,tNewK,tOldK/tNewK,np.abs(back.astype(int)-img).max()))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import glob
+import time
+import cv2 as cv
+import numpy as np
+
+root=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,root)        # run from any directory
+
+from bitSlicing import slicePlanes
+from bitPlaneCompression import encodePlane,decodePlane
+
+'''
+Benchmark of run-length (and entropy) coding of bit planes, on the sample images in images/ or on given files.
+Usage: bench_compression.py [image ...]
+For each image and each bit plane (8 = most significant): compression ratio against the packed plane
+(8 pixels in a byte, as in a P4 file) and encoding / decoding speed in MB/s of packed plane data.
+Every plane is decoded and compared with the original, so this also checks the round trip.
+'''
+if __name__=='__main__':
+    files=sys.argv[1:] or sorted(glob.glob(os.path.join(root,'images','**','*.*'),recursive=True))
+
+    for file in files:
+        img=cv.imread(file,0)                         # gray image
+        if img is None:
+            continue
+        rows,columns=img.shape
+        print(os.path.relpath(file,root),': size -',img.shape)
+
+        planes=slicePlanes(img,packed=True)
+        for i in range(len(planes)):
+            mb=planes[i].nbytes/2**20
+            line='  plane %d:' %(8-i)
+            for entropy in (False,True):
+                start=time.perf_counter()
+                data=encodePlane(planes[i],columns,entropy)
+                encode=time.perf_counter()-start
+
+                start=time.perf_counter()
+                plane=decodePlane(data,packed=True)
+                decode=time.perf_counter()-start
+                if not np.array_equal(plane,planes[i]):
+                    sys.exit(file+": plane "+str(8-i)+" differs after decoding")
+
+                line+='  %s ratio %6.2f, encode %7.1f MB/s, decode %7.1f MB/s' %('RLE+zlib' if entropy else 'RLE',planes[i].nbytes/len(data),mb/encode,mb/decode)
+            print(line)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # run from any directory
+
+import config
+from readP2file import readfile,readfile_old
+from matrix_to_ascii import createASCIIFile
+
+'''
+Benchmark of the chunked P2 reader against the earlier line by line reader.
+Usage: bench_readP2.py [size ...]  -> square synthetic images of the given sizes, default 512 2048
+'''
+if __name__=='__main__':
+    sizes=[int(s) for s in sys.argv[1:]] or [512,2048]
+
+    for size in sizes:
+        A=np.random.randint(0,256,(size,size))
+        with tempfile.TemporaryDirectory() as d:
+            filename=os.path.join(d,'bench.pgm')
+            createASCIIFile(A,size,size,255,filename)
+            mb=os.path.getsize(filename)/2**20
+
+            results=[]
+            for reader in (readfile_old,readfile):
+                config.initialise()
+                start=time.perf_counter()
+                reader(filename)
+                elapsed=time.perf_counter()-start
+                if not np.array_equal(config.A,A):
+                    sys.exit(reader.__name__+": pixels differ from the written image")
+                results.append(elapsed)
+
+        print("%dx%d (%.1f MB): readfile_old %.3f s, readfile %.3f s, speedup %.1fx" %(size,size,mb,results[0],results[1],results[0]/results[1]))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # run from any directory
+
+from threshold import applyThreshold,applyThreshold_old,applyThresholds
+
+'''
+Benchmark of the vectorized thresholding against the earlier pixel by pixel loop.
+Usage: bench_threshold.py [size ...]  -> square synthetic 8-bit images of the given sizes, default 4096 16384
+The pixel loop takes minutes on large images, so it is timed only up to 4096 x 4096.
+'''
+oldMaxSize=4096
+
+if __name__=='__main__':
+    sizes=[int(s) for s in sys.argv[1:]] or [4096,16384]
+
+    for size in sizes:
+        A=np.random.randint(0,256,(size,size),dtype=np.uint8)
+        out=np.empty_like(A)                       # preallocated output, reused across runs
+
+        start=time.perf_counter()
+        applyThreshold(A,127,out)
+        single=time.perf_counter()-start
+
+        start=time.perf_counter()
+        applyThresholds(A,[63,127,191],[0,85,170,255],out)
+        multi=time.perf_counter()-start
+
+        line="%dx%d: applyThreshold %.3f s, 3 thresholds %.3f s" %(size,size,single,multi)
+        if size<=oldMaxSize:
+            start=time.perf_counter()
+            SA_old=applyThreshold_old(A,127)
+            old=time.perf_counter()-start
+            if not np.array_equal(applyThreshold(A,127),SA_old):
+                sys.exit("applyThreshold differs from applyThreshold_old")
+            line+=", applyThreshold_old %.3f s, speedup %.0fx" %(old,old/single)
+        print(line)
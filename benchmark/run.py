@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+import contextlib
+import subprocess
+import numpy as np
+
+root=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,root)        # run from any directory
+resultsDir=os.path.join(root,'benchmark','results')
+
+'''
+Benchmark suite of the hot paths of the repository, on synthetic images, with results kept per git commit.
+
+Usage: run.py [-s size ...] [-c case ...] [-r repeat]    run the cases (default all) on square images of the given sizes
+                                                       (default 512 4096 16384) and store the results
+       run.py --compare commitA commitB                 compare the stored results of two commits
+       run.py --list                                    list the cases
+
+Every case and size runs in a fresh Python process, so the peak resident memory (RSS) of one case is not hidden by
+an earlier one. Within that process the case is prepared (image creation, not timed) and run `repeat` times; the
+fastest wall time is kept. For each case and size the results are: wall time in s, pixels/s, peak RSS of the process
+and RSS after preparing the inputs (in MB), so the difference is the memory used by the function itself.
+
+Slow reference implementations (the _old functions and Python loops over pixels) are run only up to maxSize.
+Results are stored in benchmark/results/<commit>.json (commit with '-dirty' if the tree has changes), a rerun
+updates the cases it ran.
+'''
+
+defaultSizes=[512,4096,16384]
+
+'''
+Peak resident memory of this process in MB
+'''
+def peakRSS():
+    rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss/2**20 if sys.platform=='darwin' else rss/2**10    # bytes on macOS, kB on Linux
+
+def grayImage(size):
+    return np.random.default_rng(0).integers(0,256,(size,size),dtype=np.uint8)
+
+def colorImage(size):
+    return np.random.default_rng(0).integers(0,256,(size,size,3),dtype=np.uint8)
+
+'''
+Each case: prepare(size) returns a function without arguments that runs the code to time once.
+prepare is called again before every repeat, so functions with caches or global state start fresh.
+'''
+
+def prepareHistogram(size):
+    import config
+    from histogram import createHistogram
+    config.initialise()
+    img=grayImage(size)
+    return lambda: createHistogram(img)
+
+def prepareThreshold(size):
+    import config
+    from threshold import applySingleThreshold
+    config.initialise()
+    config.A=grayImage(size)
+    config.maxGray=255
+    return lambda: applySingleThreshold(127)
+
+def prepareSlice(old):
+    def prepare(size):
+        import config
+        import bitSlicing
+        config.initialise()
+        config.A=grayImage(size)
+        config.rows=config.columns=size
+        return bitSlicing.slice_bits8_old if old else bitSlicing.slice_bits8
+    return prepare
+
+def prepareIntegral(old):
+    def prepare(size):
+        sys.path.append(os.path.join(root,'P2-code','transform'))
+        import localFourier
+        lft=np.random.default_rng(0).random((size+2,size+2,8),dtype=np.float32) # 8 padded LFT maps, as computeLFTmap
+        f=localFourier.createIntegralmap1 if old else localFourier.createIntegralmap
+        def run():
+            with contextlib.redirect_stdout(open(os.devnull,'w')):  # createIntegralmap1 prints the shape
+                f(lft)
+        return run
+    return prepare
+
+def prepareHSI(old):
+    def prepare(size):
+        from transform import colorcode
+        img=colorImage(size)
+        f=colorcode.RGB2HSI_old if old else colorcode.RGB2HSI
+        return lambda: f(img)
+    return prepare
+
+def prepareKNN(size):
+    sys.path.append(os.path.join(root,'P2-code','classification')) # appended: its threshold.py must not hide ours
+    from knn import knn
+    rng=np.random.default_rng(0)
+    X=rng.integers(0,256,(200,3))                                  # 200 training pixels of 2 classes
+    y=(X.sum(axis=1)>384).astype(int)
+    img=colorImage(size)
+    return lambda: knn(X,y,img)
+
+'''
+name -> (prepare function, largest size to run or None for all sizes)
+'''
+cases={
+    'histogram.createHistogram'        :(prepareHistogram,None),
+    'threshold.applySingleThreshold'   :(prepareThreshold,None),
+    'bitSlicing.slice_bits8'           :(prepareSlice(False),None),
+    'bitSlicing.slice_bits8_old'       :(prepareSlice(True),512),
+    'localFourier.createIntegralmap'   :(prepareIntegral(False),4096),   # 8 float maps, float64 integrals: 16384 needs > 16 GB
+    'localFourier.createIntegralmap1'  :(prepareIntegral(True),512),
+    'colorcode.RGB2HSI'                :(prepareHSI(False),None),
+    'colorcode.RGB2HSI_old'            :(prepareHSI(True),4096),
+    'knn.knn'                          :(prepareKNN,512),
+}
+
+'''
+Run one case in this process, print the result as JSON
+'''
+def runCase(name,size,repeat):
+    prepare,maxSize=cases[name]
+    best=float('inf')
+    for r in range(repeat):
+        run=None                                    # release the inputs of the previous repeat first
+        run=prepare(size)
+        if r==0:
+            setupRSS=peakRSS()                      # before the first run, later peaks include the function
+        start=time.perf_counter()
+        run()
+        best=min(best,time.perf_counter()-start)
+    print(json.dumps({'wall':best,'pixelsPerSecond':size*size/best,'peakRSS':peakRSS(),'setupRSS':setupRSS}))
+
+def gitCommit():
+    try:
+        commit=subprocess.run(['git','rev-parse','--short','HEAD'],cwd=root,capture_output=True,text=True,check=True).stdout.strip()
+        dirty=subprocess.run(['git','diff','--quiet','HEAD','--','.',':!benchmark/results'],cwd=root).returncode!=0
+    except (OSError,subprocess.CalledProcessError):
+        return 'unknown'
+    return commit+('-dirty' if dirty else '')
+
+def resultFile(commit):
+    return os.path.join(resultsDir,commit+'.json')
+
+'''
+Load the results of a commit, the commit can be abbreviated as in git
+'''
+def loadResults(commit):
+    if os.path.isdir(resultsDir):
+        for name in sorted(os.listdir(resultsDir)):
+            if name.startswith(commit) and name.endswith('.json'):
+                with open(os.path.join(resultsDir,name)) as f:
+                    return json.load(f)
+    sys.exit("no stored results for "+commit)
+
+'''
+Run the cases, each size in its own process, and store the results of the current commit
+'''
+def runAll(names,sizes,repeat):
+    commit=gitCommit()
+    path=resultFile(commit)
+    stored={'commit':commit,'results':{}}
+    if os.path.exists(path):
+        with open(path) as f:
+            stored=json.load(f)
+    stored['date']=time.strftime('%Y-%m-%d %H:%M:%S')
+    stored['machine']={'platform':platform.platform(),'python':platform.python_version(),
+                       'numpy':np.__version__,'cpus':os.cpu_count()}
+
+    print("%-34s %6s %10s %12s %10s %10s" %('case','size','wall s','Mpixels/s','peak MB','inputs MB'))
+    for name in names:
+        prepare,maxSize=cases[name]
+        for size in sizes:
+            if maxSize and size>maxSize:
+                continue
+            proc=subprocess.run([sys.executable,os.path.abspath(__file__),'--worker',name,str(size),str(repeat)],
+                                capture_output=True,text=True)
+            if proc.returncode!=0:                  # e.g. out of memory, keep going with the other cases
+                print("%-34s %6d failed: %s" %(name,size,(proc.stderr.strip().splitlines() or ['exit code %d' %proc.returncode])[-1]))
+                continue
+            result=json.loads(proc.stdout.strip().splitlines()[-1])
+            stored['results'].setdefault(name,{})[str(size)]=result
+            print("%-34s %6d %10.4f %12.1f %10.0f %10.0f" %(name,size,result['wall'],result['pixelsPerSecond']/1e6,
+                                                          result['peakRSS'],result['setupRSS']))
+
+    os.makedirs(resultsDir,exist_ok=True)
+    with open(path,'w') as f:
+        json.dump(stored,f,indent=1,sort_keys=True)
+    print("results stored in",os.path.relpath(path))
+
+'''
+Print wall time and peak memory of two commits side by side, with the ratio new/old
+'''
+def compare(old,new,threshold=0.1):
+    a,b=loadResults(old),loadResults(new)
+    print("%s -> %s" %(a['commit'],b['commit']))
+    print("%-34s %6s %10s %10s %7s %9s %9s" %('case','size','old s','new s','ratio','old MB','new MB'))
+    for name in sorted(set(a['results'])|set(b['results'])):
+        ra,rb=a['results'].get(name,{}),b['results'].get(name,{})
+        for size in sorted(set(ra)|set(rb),key=int):
+            if size not in ra or size not in rb:
+                print("%-34s %6s   only in %s" %(name,size,a['commit'] if size in ra else b['commit']))
+                continue
+            ratio=rb[size]['wall']/ra[size]['wall']
+            flag=' slower' if ratio>1+threshold else ' faster' if ratio<1-threshold else ''
+            print("%-34s %6s %10.4f %10.4f %7.2f %9.0f %9.0f%s" %(name,size,ra[size]['wall'],rb[size]['wall'],ratio,
+                                                                ra[size]['peakRSS'],rb[size]['peakRSS'],flag))
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Benchmark the hot paths of the repository')
+    parser.add_argument('-s','--sizes',type=int,nargs='+',default=defaultSizes,help='image sizes (square)')
+    parser.add_argument('-c','--cases',nargs='+',help='cases to run (names or parts of names), default all')
+    parser.add_argument('-r','--repeat',type=int,default=3,help='runs of each case, the fastest is kept')
+    parser.add_argument('--compare',nargs=2,metavar=('OLD','NEW'),help='compare stored results of two commits')
+    parser.add_argument('--list',action='store_true',help='list the cases')
+    parser.add_argument('--worker',nargs=3,help=argparse.SUPPRESS)                  # internal: run one case
+    args=parser.parse_args()
+
+    if args.worker:
+        runCase(args.worker[0],int(args.worker[1]),int(args.worker[2]))
+    elif args.list:
+        for name,(prepare,maxSize) in cases.items():
+            print(name,'(up to %d)' %maxSize if maxSize else '')
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        names=[n for n in cases if not args.cases or any(c in n for c in args.cases)]
+        if not names:
+            sys.exit("no such case")
+        runAll(names,args.sizes,args.repeat)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sys
+import zlib
+import struct
+import numpy as np
+from bitSlicing import slicePlanes,mergePlanes
+
+'''
+Compression of bit planes (from bitSlicing.slice_bits8 or slicePlanes) by run-length encoding.
+
+A plane is read row after row as one sequence of bits, and stored as the lengths of its runs of equal bits,
+starting with a run of 0s (of length 0 if the plane starts with 1). Run lengths are written as variable length
+integers, 7 bits in a byte, so short runs take one byte. Optionally the run lengths are then entropy coded
+with zlib (DEFLATE: LZ77 followed by Huffman coding).
+Noisy planes (usually the least significant ones) have runs so short that encoding would make them bigger,
+such planes are stored as they are, packed 8 pixels in a byte.
+
+Encoded plane: header (magic 'RLE1', flags, rows, columns, number of runs) followed by the run lengths.
+'''
+
+headerFormat='>4sBIIQ'         # magic, flags, rows, columns, number of runs
+headerSize=struct.calcsize(headerFormat)
+entropyFlag=1                  # flag bit: run lengths are zlib compressed
+rawFlag=2                      # flag bit: plane is stored packed, not run-length encoded
+
+'''
+Encode non-negative integers as variable length integers (7 bits in each byte, least significant first,
+high bit set in all bytes except the last byte of a number), for all numbers at once
+'''
+def encodeVarints(n):
+    n=np.asarray(n,dtype=np.uint64)
+    nbytes=np.ones(len(n),dtype=np.int64)                 # number of bytes of each number
+    for k in range(1,10):
+        nbytes+=n>=np.uint64(1)<<np.uint64(7*k)
+    start=np.cumsum(nbytes)-nbytes                        # position of the first byte of each number
+    out=np.empty(int(nbytes.sum()),dtype=np.uint8)
+    for k in range(int(nbytes.max()) if len(n) else 0):   # k-th byte of all numbers that have one
+        sel=nbytes>k
+        byte=(n[sel]>>np.uint64(7*k))&np.uint64(0x7F)
+        more=np.where(nbytes[sel]>k+1,0x80,0)             # continuation bit
+        out[start[sel]+k]=byte.astype(np.uint8)|more
+    return out.tobytes()
+
+'''
+Decode variable length integers written by encodeVarints, for all numbers at once
+'''
+def decodeVarints(data):
+    b=np.frombuffer(data,dtype=np.uint8)
+    end=np.flatnonzero(b<0x80)                            # last byte of each number
+    start=np.concatenate(([0],end[:-1]+1))
+    n=np.zeros(len(end),dtype=np.uint64)
+    for k in range(int((end-start).max())+1 if len(end) else 0):
+        idx=start+k
+        sel=idx<=end
+        n[sel]|=(b[idx[sel]]&0x7F).astype(np.uint64)<<np.uint64(7*k)
+    return n
+
+'''
+Run-length encode a bit plane
+Inputs: plane   : rows x columns matrix of bits 0 and 1, or a packed plane (rows x ceil(columns/8), from
+                  bitSlicing.packedPlane or slicePlanes(...,packed=True)) if columns is given
+        columns : number of pixels in each row of a packed plane, default 0 (plane is not packed)
+        entropy : entropy code the run lengths with zlib, default True
+Output: bytes of the encoded plane
+Logic : positions where a bit differs from the previous bit are found with np.diff, run lengths are the
+        differences between consecutive change positions
+'''
+def encodePlane(plane,columns=0,entropy=True):
+    if columns:
+        bits=np.unpackbits(np.asarray(plane,dtype=np.uint8),axis=1,count=columns)
+    else:
+        bits=np.asarray(plane,dtype=np.uint8)
+    rows,columns=bits.shape
+    bits=bits.ravel()
+
+    change=np.flatnonzero(np.diff(bits))+1                # first position of every run except the first one
+    bounds=np.concatenate(([0],change,[len(bits)]))
+    runs=np.diff(bounds)
+    if len(bits) and bits[0]==1:
+        runs=np.concatenate(([0],runs))                   # runs start with 0s
+
+    packedBytes=rows*((columns+7)//8)
+    if entropy or len(runs)<packedBytes:                  # each run takes at least a byte without entropy coding
+        data=encodeVarints(runs)
+    else:
+        data=b''
+    flags=0
+    if entropy:
+        data=zlib.compress(data)
+        flags|=entropyFlag
+    if len(data)>=packedBytes or not data:                            # encoding does not help, store the packed plane
+        data=np.packbits(bits.reshape(rows,columns),axis=1).tobytes()
+        flags=rawFlag
+        runs=[]
+    return struct.pack(headerFormat,b'RLE1',flags,rows,columns,len(runs))+data
+
+'''
+Decode a plane encoded by encodePlane
+Inputs: data   : bytes of the encoded plane
+        packed : return the plane packed 8 pixels in a byte, default False
+Output: rows x columns matrix of bits 0 and 1 (uint8), or rows x ceil(columns/8) packed matrix
+'''
+def decodePlane(data,packed=False):
+    magic,flags,rows,columns,nruns=struct.unpack(headerFormat,data[:headerSize])
+    if magic!=b'RLE1':
+        sys.exit("invalid run-length encoded plane")
+    data=data[headerSize:]
+    if flags&rawFlag:
+        plane=np.frombuffer(data,dtype=np.uint8).reshape(rows,(columns+7)//8)
+        return plane.copy() if packed else np.unpackbits(plane,axis=1,count=columns)
+    if flags&entropyFlag:
+        data=zlib.decompress(data)
+    runs=decodeVarints(data)
+    if len(runs)!=nruns or runs.sum()!=rows*columns:
+        sys.exit("corrupt run-length encoded plane")
+
+    values=(np.arange(len(runs))&1).astype(np.uint8)      # runs alternate 0s and 1s, starting with 0s
+    bits=np.repeat(values,runs.astype(np.intp)).reshape(rows,columns)
+    if packed:
+        return np.packbits(bits,axis=1)
+    return bits
+
+'''
+Compress all bit planes of an image matrix A (8-bit or 16-bit)
+Output: list of encoded planes, most significant bit first
+'''
+def compressImage(A,entropy=True):
+    columns=np.shape(A)[1]
+    return [encodePlane(plane,columns,entropy) for plane in slicePlanes(A,packed=True)]
+
+'''
+Rebuild an image matrix from the list of encoded planes returned by compressImage
+'''
+def decompressImage(encoded):
+    planes=np.stack([decodePlane(data) for data in encoded])
+    img=mergePlanes(planes,range(len(planes)))
+    return img.astype(np.uint8) if len(planes)<=8 else img
@@ -48,37 +48,107 @@ def slice_bits8_old():
 
 '''
 This function creates 8 different matrices each with the bits in positions
-1,2,3,4,5,6,7,8 of the input matrix.
+8,7,6,5,4,3,2,1 of the input matrix.
 Input  : global variable numpy array A declared in config.py
 Outputs: 8 numpy arrays, in a list ,bitList, as declared in config.py -
-           bitList[0] contains least significant bit of each elements of A
-           bitList[1] contains 2nd bit from right of each elements of A
-           bitList[2] contains 3rd bit from right of each elements of A
-           bitList[3] contains 4th bit from right of each elements of A
-           bitList[4] contains 5th bit from right of each elements of A
-           bitList[5] contains 6th bit from right of each elements of A
-           bitList[6] contains 7th bit from right of each elements of A
-           bitList[7] contains most significant bit of each elements of A
+           bitList[0] contains most significant bit of each elements of A
+           bitList[1] contains 7th bit from right of each elements of A
+           bitList[2] contains 6th bit from right of each elements of A
+           bitList[3] contains 5th bit from right of each elements of A
+           bitList[4] contains 4th bit from right of each elements of A
+           bitList[5] contains 3rd bit from right of each elements of A
+           bitList[6] contains 2nd bit from right of each elements of A
+           bitList[7] contains least significant bit of each elements of A
 
-Logic   : This function uses Pythin's bit unpack in-built function
+Logic   : The matrices are views of one contiguous array created by slicePlanes
 '''
 
 
 def slice_bits8():
-    config.A=np.array(config.A,dtype=np.uint8)                     # convert matrix to unsigned integer form, so unpackbit function can be applied to it
-    unpackA=np.unpackbits(config.A,axis=1)                  # unpack each row of A with 8 bits for each element. E.g. [1,2] -> [0,0,0,0,0,0,0,1,0,0,0,0,0,0,1,0]
-    for bit in range(8):                             # create bit sliced matrices
-        bitIndex=np.arange(bit,(config.columns)*8,8) # index list for index slicing. E.g. to slice all 0th bit index ->[0,8,16,24,...]
-        config.bitList.append(unpackA[:,bitIndex])   # store bit-sliced matrices in a global list
+    config.A=np.array(config.A,dtype=np.uint8)                     # convert matrix to unsigned integer form
+    config.bitList.extend(sliceBits(config.A))       # store bit-sliced matrices in a global list
+
+'''
+Creates the 8 bit sliced matrices of an 8-bit image matrix A, without touching the global variables in config.
+Output: list of 8 matrices, most significant bit first (same order as config.bitList after slice_bits8)
+'''
+def sliceBits(A):
+    return list(slicePlanes(np.asarray(A,dtype=np.uint8)))
+
+'''
+Creates all bit planes of an image matrix A in one pass
+Inputs: A      : image matrix, 8-bit or 16-bit
+        bits   : number of bit planes, default 8 for 8-bit and 16 for 16-bit images
+        packed : if True, each plane is packed 8 pixels in a byte (see packedPlane), default False
+Output: contiguous bits x rows x columns uint8 array with values 0 and 1, most significant bit first,
+        or bits x rows x ceil(columns/8) array of packed planes
+Logic : planes[i] = (A >> (bits-1-i)) & 1 for all i at once, by broadcasting A against the array of shifts.
+        Shifting and masking are done in place in the output array, so no intermediate copy is created.
+'''
+def slicePlanes(A,bits=0,packed=False):
+    A=np.asarray(A)
+    if A.dtype.kind!='u':                            # signed or float matrix, e.g. from np.array(list)
+        A=A.astype(np.uint16 if A.max()>255 else np.uint8)
+    if bits==0:
+        bits=8*A.dtype.itemsize
+
+    if packed:
+        planes=np.empty((bits,A.shape[0],(A.shape[1]+7)//8),dtype=np.uint8)
+        for i in range(bits):
+            planes[i]=packedPlane(A,bits-1-i)
+        return planes
+
+    shifts=np.arange(bits-1,-1,-1,dtype=A.dtype.newbyteorder('='))[:,None,None] # MSB first
+    planes=np.empty((bits,)+A.shape,dtype=np.uint8)
+    np.right_shift(A[None],shifts,out=planes,casting='unsafe') # higher bits are cut off by the uint8 output ...
+    np.bitwise_and(planes,1,out=planes)                          # ... and the rest masked here
+    return planes
+
+'''
+Creates one bit sliced matrix of an image matrix A, packed 8 pixels in a byte (same layout as np.packbits(...,axis=1))
+Inputs: A         : image matrix, 8-bit or 16-bit
+        bit       : position of the bit, 0 for least significant bit
+        stripRows : number of rows processed at once, default 1024
+Output: rows x ceil(columns/8) uint8 matrix, ready to be written with matrix_to_bitmap.createBitmapFile
+Logic : the bit is extracted and packed strip by strip, so an unpacked matrix of the whole image is never created
+'''
+def packedPlane(A,bit,stripRows=1024):
+    rows,columns=A.shape
+    P=np.empty((rows,(columns+7)//8),dtype=np.uint8)
+    for start in range(0,rows,stripRows):
+        strip=A[start:start+stripRows]
+        P[start:start+stripRows]=np.packbits((strip>>bit)&1,axis=1)
+    return P
+
+'''
+Combines any subset of bit planes to an image
+Inputs: planes : bits x rows x columns array from slicePlanes (or a list of planes), most significant bit first
+        select : indices of the planes to be combined, e.g. [0,1] for bits 8 and 7 of an 8-bit image
+Output: rows x columns matrix, the selected planes are combined as bits of a len(select) bit number,
+        first selected plane as the most significant bit. E.g. [0,1] gives values 0 to 3, same as config.A87
+Logic : a single weighted dot product over the plane axis, weight 0 for planes not selected
+'''
+def mergePlanes(planes,select):
+    planes=np.asarray(planes)
+    weights=np.zeros(len(planes),dtype=np.uint16 if len(select)<=16 else np.uint32)
+    for k in range(len(select)):
+        weights[select[k]]=1<<(len(select)-1-k)
+    return np.einsum('i,i...->...',weights,planes) # sum of weights[i]*planes[i]
+
+'''
+Merges the n most significant bit matrices of a bit list (most significant bit first) to produce a visible image
+'''
+def mergeBits(bitList,n):
+    return mergePlanes(bitList[:n],range(n))
 
 '''
 Merges the most signoficant bit and next significant bit to produce a visible image
 '''
 def merge_bits_87():
-    config.A87 = (2* config.bitList[0])+config.bitList[1]
+    config.A87 = mergeBits(config.bitList,2)
     
 '''
 Merges three most signoficant bits to produce a visible image
 '''
 def merge_bits_876():
-    config.A876 = 4*config.bitList[0]+ 2* config.bitList[1]+config.bitList[2]
+    config.A876 = mergeBits(config.bitList,3)
@@ -1,41 +1,55 @@
 import cv2 as cv
+import os
 import sys
 import numpy as np
 from matplotlib import pyplot as plt
 from transform import colorcode as cl 
+from transform.tiledConvert import convertTiled,preview
+
+'''
+Usage: convert_RGB_CMY_HSI.py [file [workdir]]
+Conversions run strip by strip in parallel threads (transform/tiledConvert.py). If workdir is given, the converted
+images are memory-mapped .npy files in workdir instead of arrays in memory, for images too large for RAM.
+Plots show a subsampled preview of each image.
+'''
 
 if __name__=='__main__':
     if len(sys.argv)<2:                                 # Process input file from command line argument
         file="Luna.jpg"                                 # if no input provided, process Luna.jpg
     else:
         file=sys.argv[1]
+    workdir=sys.argv[2] if len(sys.argv)>2 else None
         
 img=cv.imread(file)                                     # convert file to image tensor
 
 if img is None:
     sys.exit("Could not read the image "+file)
 
-b,g,r=img[:,:,0],img[:,:,1],img[:,:,2]                  # split into blue, green, red
+def output(name):                                       # memory-mapped output file in workdir, if any
+    return os.path.join(workdir,os.path.basename(file)[:-4]+'_'+name+'.npy') if workdir else None
 
 # Convert RGB->CMYK 
 
-imgK=cl.RGB2CMYK(img)                                   # convert RGB to CMYK format
+imgK=convertTiled(cl.RGB2CMYK,img,outfile=output('CMYK')) # convert RGB to CMYK format
 
 # Convert CMYK->RGB and compare with original image
 
-rgbimg=cl.CMYK2RGB(imgK)
+rgbimg=convertTiled(cl.CMYK2RGB,imgK,outfile=output('CMYK_RGB'))
 
-difimg=img-rgbimg
+difimg=convertTiled(np.subtract,img,rgbimg,outfile=output('CMYK_Diff'))
 
 # Convert RGB->HSI 
 
-oimg=cl.RGB2HSI(img)                                    # convert RGB to HSI format
-h,s,i=oimg[:,:,0],oimg[:,:,1],oimg[:,:,2]               # 0<=H<6.28 (2*pi), 0<=S<=1, 0<=I<=255
+oimg=convertTiled(cl.RGB2HSI,img,outfile=output('HSI'))  # convert RGB to HSI format
 
 # Convert HSI->RGB and compare with original image
 
-rgbimg1=cl.HSI2RGB(oimg)
-difimg1=img-rgbimg1
+rgbimg1=convertTiled(cl.HSI2RGB,oimg,outfile=output('HSI_RGB'))
+difimg1=convertTiled(np.subtract,img,rgbimg1,outfile=output('HSI_Diff'))
+
+img,imgK,rgbimg,difimg,oimg,rgbimg1,difimg1=[preview(x) for x in (img,imgK,rgbimg,difimg,oimg,rgbimg1,difimg1)]
+b,g,r=img[:,:,0],img[:,:,1],img[:,:,2]                  # split into blue, green, red
+h,s,i=oimg[:,:,0],oimg[:,:,1],oimg[:,:,2]               # 0<=H<360, 0<=S<=1, 0<=I<=255
 
 # Display RGB and CMYK channels
 
@@ -1,6 +1,13 @@
+import os
+import sys
+import functools
 import cv2 as cv
 import numpy as np
 from matplotlib import pyplot as plt
+from localStatistics import windowArgmin
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # pipeline.py is in the parent directory
+from pipeline import runPipeline,readImage
 
 '''
 Program for adaptive edge smoothing.
@@ -13,59 +20,87 @@ This process preserves edges, as variance is maximum for edge regions.
 Parameters : files -> list containing the inout file names
              ksize -> width (in pixel) of the square filter for smoothing
 '''
+
+'''
+Mean map and variance map of a gray image for a ksize x ksize box kernel
+borderType is the OpenCV border mode used by cv.blur at the image boundary (default cv.BORDER_DEFAULT)
+'''
+def meanVarianceMaps(img,ksize=5,borderType=cv.BORDER_DEFAULT):
+    meanMap=cv.blur(img,(ksize,ksize),borderType=borderType)      #  Calculate mean based on the box kernel for each pixel positions
+    sqr=np.square(img,dtype=np.float32)
+    meanSqMap=cv.blur(sqr,(ksize,ksize),borderType=borderType)    # Calculate E[x^2]
+    varianceMap=meanSqMap-np.square(meanMap,dtype=np.float32)     # Variance = E[x^2] - (E[x])^2, in float32 so it does not wrap
+    np.maximum(varianceMap,0,out=varianceMap)                     # (E[x] is rounded, the difference can be slightly negative)
+    return meanMap,varianceMap
+
+'''
+Adaptive edge smoothing of a gray image
+Inputs: img        : 2-D 8-bit gray image
+        ksize      : width (in pixel) of the square filter for smoothing, default 5
+        borderType : OpenCV border mode of the box filter, default cv.BORDER_DEFAULT
+Output: smoothed image, and the mean map (box filtered image)
+'''
+def adaptiveEdgeSmoothing(img,ksize=5,borderType=cv.BORDER_DEFAULT):
+    meanMap,varianceMap=meanVarianceMaps(img,ksize,borderType)
+    rowIndex,colIndex=windowArgmin(varianceMap,ksize)
+    return meanMap[rowIndex,colIndex],meanMap       # value from the mean map at the position of minimum variance
+
+'''
+Same as adaptiveEdgeSmoothing, with a Python loop over pixels. Kept for reference and for benchmarks.
+'''
+def adaptiveEdgeSmoothing_old(img,ksize=5,borderType=cv.BORDER_DEFAULT):
+    meanMap,varianceMap=meanVarianceMaps(img,ksize,borderType)
+
+    pad=ksize//2
+
+    rows,cols=img.shape
+    oimg=np.zeros((rows,cols),dtype=np.uint8)      # initialise output image as all 0
+
+    ## For each pixel of the variance map, calculate window size as the portion of the image, if the center pixel
+    ## of the kernel is kept on top of the variance map. Get the position of minimum variances within the window,
+    ## value from the mean map from that position is copied to output.
+
+    for row in range(rows):
+        startRow=max(0,row-pad)                    # start row of the window. In case the kernel crosses the input image boundary, only the portion inside the input image in considered in window.
+        endRow=min(rows,row+pad+1)                 # end row+1 of the window is calculated considering no spill beyong border
+        for col in range(cols):
+            startCol=max(0,col-pad)                # start column of window
+            endCol=min(cols,col+pad+1)             # end column of window
+            r,c=np.unravel_index(np.argmin(varianceMap[startRow:endRow,startCol:endCol]),(endRow-startRow,endCol-startCol))
+            outRow=startRow+r                      # get position of the minimum variance (within window), and convert it to the position in input image
+            outCol=startCol+c
+            oimg[row,col]=meanMap[outRow,outCol]   # get value of the calculated position from mean map to output image
+    return oimg,meanMap
+
+def smoothAndPlot(file,img,ksize=5):
+    '''
+    Compute stage of the pipeline of the main program: smooth one image, save the plot, return the images to write
+    ksize is bound with functools.partial by the main program
+    '''
+    oimg,meanMap=adaptiveEdgeSmoothing(img,ksize)
+
+    ## Plot original image, smoothed image with the box filter and adaptive edge smoothed image in a row, and save the plot
+    plt.clf()
+
+    plt.subplot(131)
+    plt.imshow(img,cmap='Greys_r')
+    plt.title('Original')
+    
+    plt.subplot(132)
+    plt.imshow(meanMap,cmap='Greys_r')
+    plt.title('Blur')
+
+    plt.subplot(133)
+    plt.imshow(oimg,cmap='Greys_r')
+    plt.title('Adaptive Edge Blur')
+
+    plt.savefig(file[:-4]+'_AdaptiveEdgeResults.jpg')
+    return [(file[:-4]+'_blur.jpg',meanMap),(file[:-4]+'_AdaptiveEdge.jpg',oimg)]
+
 if __name__=='__main__':
 
     files=['balloons_noisy.ascii.pgm','Pegeon.PNG']    # List of input files
     ksize=5                                            # Size of the box kernel
 
-    for i in range(len(files)):                        # For each input file
-        img=cv.imread(files[i],0)                      #  Read input
-        meanMap=cv.blur(img,(ksize,ksize))             #  Calculate mean based on the box kernel for each pixel positions
-        cv.imwrite(files[i][:-4]+'_blur.jpg',meanMap)  
-
-        sqr=np.square(img,dtype=np.uint16)              
-        meanSqMap=cv.blur(sqr,(ksize,ksize))           # Calculate E[x^2] 
-
-        varianceMap=meanSqMap-np.square(meanMap,dtype=np.uint16) # Variance = E[x^2] - (E[x])^2
-
-        pad=ksize//2 
-      
-        rows,cols=img.shape
-        oimg=np.zeros((rows,cols),dtype=np.uint8)      # initialise output image as all 0
-        
-        ## For each pixel of the variance map, calculate window size as the portion of the image, if the center pixel
-        ## of the kernel is kept on top of the variance map. Get the position of minimum variances within the window,
-        ## value from the mean map from that position is copied to output.
-        
-
-        for row in range(rows):                        
-            startRow=max(0,row-pad)                    # start row of the window. In case the kernel crosses the input image boundary, only the portion inside the input image in considered in window.
-            endRow=min(rows,row+pad+1)                 # end row+1 of the window is calculated considering no spill beyong border
-            for col in range(cols):
-                startCol=max(0,col-pad)                # start column of window
-                endCol=min(cols,col+pad+1)             # end column of window
-                r,c=np.unravel_index(np.argmin(varianceMap[startRow:endRow,startCol:endCol]),(endRow-startRow,endCol-startCol))
-                outRow=startRow+r                      # get position of the minimum variance (within window), and convert it to the position in input image
-                outCol=startCol+c
-                oimg[row,col]=meanMap[outRow,outCol]   # get value of the calculated position from mean map to output image
-        cv.imwrite(files[i][:-4]+'_AdaptiveEdge.jpg',oimg)
-
-        ## Plot original image, smoothed image with the box filter and adaptive edge smoothed image in a row, and save the plot
-        plt.clf()
-
-        plt.subplot(131)
-        plt.imshow(img,cmap='Greys_r')
-        plt.title('Original')
-        
-        plt.subplot(132)
-        plt.imshow(meanMap,cmap='Greys_r')
-        plt.title('Blur')
- 
-        plt.subplot(133)
-        plt.imshow(oimg,cmap='Greys_r')
-        plt.title('Adaptive Edge Blur')
-
-        plt.savefig(files[i][:-4]+'_AdaptiveEdgeResults.jpg')
-                
-                
-        
+    ## Files are read, smoothed and written in a pipeline (pipeline.py), so reading and writing overlap smoothing
+    runPipeline(files,functools.partial(smoothAndPlot,ksize=ksize),read=lambda file: readImage(file,0))
@@ -1,10 +1,16 @@
+import os
 import sys
+import functools
 import numpy as np
-from skimage import io, filters
+from scipy import ndimage as ndi
+from skimage import io, util
 from matplotlib import pyplot as plt
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # pipeline.py is in the parent directory
+from pipeline import runPipeline
 
-def diffuse_image(img,B,l=0.25):
+
+def diffuse_image_old(img,B,l=0.25):
     '''
     Anisotropic diffusion of an image.
     input: img - input image to be diffused
@@ -36,63 +42,233 @@ def diffuse_image(img,B,l=0.25):
     oimg=img+l*(dN*cN+dS*cS+dE*cE+dW*cW) # diffuse the image as per weights decided based on gradients in 4 directions
 
     return oimg
-    
-if __name__=='__main__':
 
-    ## Input parameters ##
+def allocate_buffers(shape):
+    '''
+    Work buffers of the diffusion, allocated once and reused in every iteration.
+    input: shape - shape of the image
+    output : (gradient, coefficient, flux) float32 arrays
+    '''
+    return tuple(np.empty(shape,dtype=np.float32) for i in range(3))
 
-    files=['Cameraman.ppm']        # Enter the names of the files to be smoothed
-    C=90                           # C% weakest gradient magnitudes are noises
-    l=0.25                         # weight for diffusion
-    n=40                           # number of iterations for smoothing
-    ## Read image(s) ##
+def _add_flux(d,c,flux,B,first):
+    '''
+    Adds the diffusion flux d*exp(-(d/B)^2) of one direction to flux, all in place in the buffers.
+    '''
+    np.divide(d,B,out=c)
+    np.square(c,out=c)
+    np.negative(c,out=c)
+    np.exp(c,out=c)            # weightage of the gradient = e ^(-(gradient/B)^2)
+    np.multiply(c,d,out=c)
+    if first:
+        flux[...]=c
+    else:
+        flux+=c
+
+def diffuse_step(img,B,l=0.25,buffers=None):
+    '''
+    One iteration of anisotropic diffusion, in place.
+    input: img     - float32 image or (N, H, W) stack of images, overwritten by the diffused image
+           B       - the threshold of gradient. Edges with gradient bigger than B will be preserved.
+                     For an (N, H, W) stack of images, an (N, 1, 1) array of thresholds
+           l       - weight for diffusion. Default value 0.25
+           buffers - work buffers from allocate_buffers, allocated here if not given
+    outout : largest absolute change of a pixel in this iteration
+    Same result as diffuse_image_old (pixels outside the image are 0), but neighbours are read through slices of img
+    instead of np.roll copies, and all intermediate arrays are the 3 preallocated buffers.
+    '''
+    d,c,flux=buffers if buffers is not None else allocate_buffers(img.shape)
+
+    np.subtract(img[...,:-1,:],img[...,1:,:],out=d[...,1:,:])   # north: pixel above - pixel
+    np.negative(img[...,0,:],out=d[...,0,:])
+    _add_flux(d,c,flux,B,True)
+
+    np.subtract(img[...,1:,:],img[...,:-1,:],out=d[...,:-1,:])  # south: pixel below - pixel
+    np.negative(img[...,-1,:],out=d[...,-1,:])
+    _add_flux(d,c,flux,B,False)
+
+    np.subtract(img[...,1:],img[...,:-1],out=d[...,:-1])        # east: pixel on the right - pixel
+    np.negative(img[...,-1],out=d[...,-1])
+    _add_flux(d,c,flux,B,False)
+
+    np.subtract(img[...,:-1],img[...,1:],out=d[...,1:])         # west: pixel on the left - pixel
+    np.negative(img[...,0],out=d[...,0])
+    _add_flux(d,c,flux,B,False)
+
+    flux*=l
+    img+=flux                  # diffuse the image as per weights decided based on gradients in 4 directions
+    np.abs(flux,out=flux)
+    return float(flux.max()) if flux.size else 0.0
 
+def diffuse_image(img,B,l=0.25):
+    '''
+    Anisotropic diffusion of an image, one iteration.
+    input: img - input image to be diffused
+           B   - the threshold of gradient. Edges with gradient bigger than B will be preserved
+           l   - weight for diffusion. Default value 0.25
+    outout : oimg - diffused image with edges preserved (float32)
+    '''
+    oimg=np.array(img,dtype=np.float32)
+    diffuse_step(oimg,B,l)
+    return oimg
+
+def sobel_stack(img):
+    '''
+    Sobel edge map of an image, or of every image of an (N, H, W) stack at once.
+    Same as skimage.filters.sobel on each image: kernels [1,0,-1] x [1,2,1]/4, symmetric ('reflect') border,
+    magnitude sqrt((horizontal^2 + vertical^2)/2).
+    '''
+    img=np.asarray(img,dtype=np.float32)
+    smooth=np.array([1,2,1],dtype=np.float32)/4
+    h=ndi.correlate1d(ndi.correlate1d(img,[1,0,-1],axis=-1,mode='reflect'),smooth,axis=-2,mode='reflect')
+    v=ndi.correlate1d(ndi.correlate1d(img,[1,0,-1],axis=-2,mode='reflect'),smooth,axis=-1,mode='reflect')
+    h*=h
+    v*=v
+    h+=v
+    h/=2
+    return np.sqrt(h,out=h)
+
+def gradient_threshold(img,C):
+    '''
+    Gradient threshold of an image: the C-th percentile of its Sobel edge map.
+    For an (N, H, W) stack, one threshold per image, as an (N, 1, 1) array that broadcasts against the stack.
+    output : threshold(s), edge map(s)
+    '''
+    edge_map_sobel = sobel_stack(img)       # gradient image using Sobel operator
+    if edge_map_sobel.ndim==2:
+        return np.percentile(edge_map_sobel,C),edge_map_sobel
+    thresh=np.percentile(edge_map_sobel.reshape(len(edge_map_sobel),-1),C,axis=1)
+    return thresh.astype(np.float32)[:,None,None],edge_map_sobel
+
+def anisotropic_diffusion(img,C=90,l=0.25,n=40,tol=0.0,threshold_every=1,snapshot_every=0,snapshot=None):
+    '''
+    Iterative anisotropic diffusion with preallocated buffers.
+    input: img             - input image to be diffused, or an (N, H, W) stack of same size images, diffused together
+                             in one vectorized pass per iteration with a threshold for each image
+           C               - C% weakest gradient magnitudes are noises, the threshold is the C-th percentile of the
+                             Sobel edge map of the current image
+           l               - weight for diffusion. Default value 0.25
+           n               - maximum number of iterations. Default 40
+           tol             - stop early when no pixel (of any image) changes by more than tol in an iteration.
+                             Default 0 (run n iterations)
+           threshold_every - recompute the threshold every threshold_every iterations. Default 1 (every iteration)
+           snapshot_every  - call snapshot every snapshot_every iterations, 0 for never
+           snapshot        - function(i, image, edge map, threshold) to save or plot the image before iteration i.
+                             The edge map is the one of the last threshold computation.
+    outout : diffused float32 image (or stack), number of iterations done
+    '''
+    curimg=np.array(img,dtype=np.float32)   # diffused in place
+    buffers=allocate_buffers(curimg.shape)
+    for i in range(n):
+        if i%threshold_every==0:
+            thresh,edge_map_sobel=gradient_threshold(curimg,C)
+        if snapshot is not None and snapshot_every and i%snapshot_every==0:
+            snapshot(i,curimg,edge_map_sobel,thresh)
+        change=diffuse_step(curimg,thresh,l,buffers) # diffuse the image preserving real edges
+        if change<=tol:
+            return curimg,i+1
+    return curimg,n
+    
+def read_batch(files):
+    '''
+    Reader stage of the pipeline of the main program: read a batch of files, group images of the same size
+    output : list of (file names, stack of images)
+    '''
+    groups={}                      # images of the same size are diffused together as one stack
     for file in files:
-        img=io.imread(file,as_gray=True)        # read input file
+        img=io.imread(file,as_gray=True)        # read input file, gray 8-bit and 16-bit files stay integers
         if img is None:
             sys.exit(file+': file not found.')
+        img=util.img_as_float(img)              # intensities 0 to 1 for any input type, as the snapshots expect
  
         print(file, ': size - ', img.shape)
+        groups.setdefault(img.shape,[]).append((file,img))
+    return [([file for file,img in group],np.stack([img for file,img in group])) for group in groups.values()]
 
-    ## smooth images iteratively ##
+def diffuse_batch(files,groups,C=90,l=0.25,n=40,tol=0.0,threshold_every=1,snapshot_every=10,plot_samples=4):
+    '''
+    Compute stage of the pipeline of the main program: smooth the stacks of a batch iteratively, save the plots
+    input: files, groups   - the batch and its stacks from read_batch
+           C, l, n, tol, threshold_every, snapshot_every - as in anisotropic_diffusion, bound with functools.partial
+                             by the main program
+           plot_samples    - only the first plot_samples images of each stack are plotted, so at most plot_samples
+                             figures are open at a time. Snapshots of all images are written. Default 4
+    output : list of (file name, 8-bit snapshot image) to write
+    '''
+    outputs=[]
+    m=4                            # number of columns in plot showing results of diffusion
+    rows=(n+snapshot_every-1)//snapshot_every if snapshot_every else 0
 
-        curimg=img                 # initialise input image for 1st iretation
-        plt.clf()
-        m=4                        # number of columns in plot showing results of diffusion
-        for i in range(n):
-            edge_map_sobel = filters.sobel(curimg)  # gradient image using Sobel operator
-            thresh=np.percentile(edge_map_sobel,C)  # get threshold gradient as the C% least value from all gradients
-            real_edges=np.where(edge_map_sobel>thresh,255,0)
+    for names,stack in groups:
+        figures=[plt.figure() for file in names[:plot_samples]] if rows else []
 
-            dimg=diffuse_image(curimg,thresh,l)     # diffuse the image preserving real edges
+        def snapshot(i,stack,edge_maps,thresh):
+            k=i//snapshot_every
+            for j in range(len(names)):
+                curimg=stack[j]
+                outputs.append((names[j][:-4]+'_iter'+str(i)+'.jpg',util.img_as_ubyte(np.clip(curimg,0,1)))) # JPEG needs 8-bit pixels, clip only rounding
+                if j>=len(figures):
+                    continue
+                edge_map_sobel=edge_maps[j]
+                real_edges=np.where(edge_map_sobel>thresh[j],255,0)
+                plt.figure(figures[j].number)
 
     ## plot smoothed images and histograms 
-            if i%10==0:
-                plt.subplot(n/10,m,m*i/10+1)                  # show image for current iteration of diffusion in the plot    
+                plt.subplot(rows,m,m*k+1)                  # show image for current iteration of diffusion in the plot    
                 plt.imshow(curimg,cmap='Greys_r')
                 if i == 0:
                     plt.title("Image")
 
-                plt.subplot(n/10,m,m*i/10+2)                  # show histogram of gradients and a red vertical line at C%
+                plt.subplot(rows,m,m*k+2)                  # show histogram of gradients and a red vertical line at C%
                 plt.hist(edge_map_sobel.flatten())
                 if i == 0:
                     plt.title('Histogram')
-                plt.axvline(x=thresh,color='r')
+                plt.axvline(x=thresh[j].item(),color='r')
             
-                plt.subplot(n/10,m,m*i/10+3)                  # show edge map (gradients)
+                plt.subplot(rows,m,m*k+3)                  # show edge map (gradients)
                 plt.imshow(edge_map_sobel,cmap='Greys_r')
                 if i == 0:
                     plt.title("Edge map")
 
-                plt.subplot(n/10,m,m*i/10+4)                  # show edge map to be preserved (top 100-C % gradients)
+                plt.subplot(rows,m,m*k+4)                  # show edge map to be preserved (top 100-C % gradients)
                 plt.imshow(real_edges,cmap='Greys_r')
                 if i == 0:
                     plt.title("Edges preserved")
 
-            io.imsave(file[:-4]+'_iter'+str(i)+'.jpg',curimg)
+        try:
+            dimg,iterations=anisotropic_diffusion(stack,C,l,n,tol,threshold_every,snapshot_every,snapshot)
+            print(names, ':', iterations, 'iterations')
+            for j in range(len(figures)):
+                figures[j].savefig(names[j][:-4]+'_AnisotropicDiffusion.png')
+        finally:
+            for figure in figures:                     # also when diffusion fails, so figures do not pile up
+                plt.close(figure)
+    return outputs
 
-            curimg=dimg                             # diffused image is the input for next iteration
+def write_snapshots(outputs):
+    '''
+    Writer stage of the pipeline of the main program
+    '''
+    for file,img in outputs:
+        io.imsave(file,img)
 
-        plt.savefig(file[:-4]+'_AnisotropicDiffusion.png')
-            
-        
+if __name__=='__main__':
+
+    ## Input parameters ##
+
+    files=['Cameraman.ppm']        # Enter the names of the files to be smoothed
+    C=90                           # C% weakest gradient magnitudes are noises
+    l=0.25                         # weight for diffusion
+    n=40                           # number of iterations for smoothing
+    tol=0.0                        # stop when no pixel changes more than tol in an iteration
+    threshold_every=1              # recompute the gradient threshold every threshold_every iterations
+    snapshot_every=10              # save and plot the images every snapshot_every iterations
+    batch=64                       # number of files read and smoothed together
+    plot_samples=4                 # number of images of each batch plotted
+
+    ## Files are read, smoothed and written in a pipeline (pipeline.py): batch k+1 is read and the snapshots of
+    ## batch k-1 are written while batch k is smoothed
+
+    diffuse=functools.partial(diffuse_batch,C=C,l=l,n=n,tol=tol,threshold_every=threshold_every,
+                              snapshot_every=snapshot_every,plot_samples=plot_samples)
+    runPipeline([files[k:k+batch] for k in range(0,len(files),batch)],diffuse,read_batch,write_snapshots)
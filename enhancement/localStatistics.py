@@ -0,0 +1,134 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+'''
+Local statistics of a gray image (mean, variance and position of the minimum variance in a square window around
+each pixel) from integral images (summed-area tables).
+
+integralImages computes the integral images of the image and of its square once. After that, the sum over any
+window is 4 look ups, so statistics for any number of window sizes are computed in O(1) per pixel each, without
+filtering the image again for every ksize.
+
+Windows crossing the image border keep only the part inside the image, i.e. the mean is the mean of the pixels
+inside the window. Sums are exact in int64, and the variance is computed in float64 and clipped at 0, so it never
+wraps like a uint16 E[x^2]-(E[x])^2.
+'''
+
+'''
+Integral images of a gray image and of its square
+Input : img : 2-D 8-bit or 16-bit gray image
+Output: (S, S2), int64 matrices of size (rows+1) x (columns+1), with a first row and column of 0s:
+        S[r,c] = sum of img[:r,:c], S2[r,c] = sum of img[:r,:c]**2
+'''
+def integralImages(img):
+    img=np.asarray(img)
+    rows,cols=img.shape
+    S=np.zeros((rows+1,cols+1),dtype=np.int64)
+    S2=np.zeros((rows+1,cols+1),dtype=np.int64)
+    np.cumsum(img,axis=0,dtype=np.int64,out=S[1:,1:])
+    np.cumsum(S[1:,1:],axis=1,out=S[1:,1:])
+    np.square(img,dtype=np.int64,out=S2[1:,1:])
+    np.cumsum(S2[1:,1:],axis=0,out=S2[1:,1:])
+    np.cumsum(S2[1:,1:],axis=1,out=S2[1:,1:])
+    return S,S2
+
+'''
+Window bounds for every position 0 to size-1: window covers start to end-1, truncated at the border
+'''
+def _bounds(size,pad):
+    pos=np.arange(size)
+    return np.maximum(pos-pad,0),np.minimum(pos+pad+1,size)
+
+'''
+Sum over the ksize x ksize window around every pixel from an integral image S, and the number of pixels of each window
+'''
+def windowSums(S,ksize):
+    pad=ksize//2
+    r0,r1=_bounds(S.shape[0]-1,pad)
+    c0,c1=_bounds(S.shape[1]-1,pad)
+    R=S[r1]-S[r0]                                    # sums of the window rows, whole rows of S at a time
+    sums=R[:,c1]-R[:,c0]
+    counts=(r1-r0)[:,None]*(c1-c0)[None,:]
+    return sums,counts
+
+'''
+Local mean map of the ksize x ksize window around every pixel
+Inputs: sats  : (S, S2) from integralImages
+        ksize : width of the square window
+Output: float32 mean map
+'''
+def localMean(sats,ksize):
+    sums,counts=windowSums(sats[0],ksize)
+    return (sums/counts).astype(np.float32)
+
+'''
+Local mean and variance maps of the ksize x ksize window around every pixel
+Inputs: sats  : (S, S2) from integralImages
+        ksize : width of the square window
+Output: float32 mean map, float32 variance map (>= 0)
+'''
+def localMeanVariance(sats,ksize):
+    sums,counts=windowSums(sats[0],ksize)
+    sqSums,counts=windowSums(sats[1],ksize)
+    mean=sums/counts
+    variance=sqSums/counts-np.square(mean)           # E[x^2]-(E[x])^2 in float64
+    np.maximum(variance,0,out=variance)              # rounding can leave tiny negative values on flat windows
+    return mean.astype(np.float32),variance.astype(np.float32)
+
+'''
+Minimum of every window of a cost map along one axis, with the index of its first occurrence
+Inputs: cost : 2-D float cost map
+        pad  : window covers positions i-pad to i+pad, truncated at the border of the map
+        axis : 0 for windows over rows, 1 for windows over columns
+Output: map of window minimums, map of their indices along axis
+Logic : the map is padded with +inf so truncated windows never pick a position outside the map. np.argmin over a
+        sliding window view (no copy) keeps the first position of equal minimums.
+'''
+def _windowArgmin(cost,pad,axis):
+    padding=[(0,0),(0,0)]
+    padding[axis]=(pad,pad)
+    windows=sliding_window_view(np.pad(cost,padding,constant_values=np.inf),2*pad+1,axis=axis)
+    offset=windows.argmin(axis=-1)                              # position in the window
+    best=np.take_along_axis(windows,offset[...,None],axis=-1)[...,0]
+    pos=np.arange(cost.shape[axis])-pad                         # position of the start of the window
+    return best,offset+(pos[:,None] if axis==0 else pos[None,:])
+
+'''
+For each pixel, position of the minimum of costMap in the window centred on it (first in row-major order, like
+np.argmin on the window followed by np.unravel_index)
+Inputs: costMap : 2-D cost map, e.g. the variance map
+        ksize   : width of the square window; windows crossing the border keep only the part inside the map
+Output: row and column index maps of the minimums
+Logic : separable reduction. Along rows, the first column with the minimum of each row of the window; then across
+        rows, the first row whose row minimum is the window minimum. That gives the row-major first minimum, in
+        O(ksize) whole array operations instead of a Python loop over pixels.
+'''
+def windowArgmin(costMap,ksize):
+    pad=ksize//2
+    rowMin,colIndex=_windowArgmin(np.asarray(costMap,dtype=np.result_type(costMap,np.float32)),pad,1) # horizontal pass
+    minimum,rowIndex=_windowArgmin(rowMin,pad,0)                                # vertical pass on the row minimums
+    cols=np.arange(costMap.shape[1])[None,:]
+    return rowIndex,colIndex[rowIndex,cols]                                    # column of the minimum in the chosen row
+
+'''
+Minimum variance (adaptive edge) smoothing: every pixel gets the local mean at the position of minimum local
+variance in its window
+Inputs: img   : 2-D gray image, or None if sats is given
+        ksize : width of the square window
+        sats  : optional (S, S2) from integralImages, to reuse them across window sizes
+Output: float32 smoothed image
+'''
+def minVarianceSmoothing(img,ksize,sats=None):
+    if sats is None:
+        sats=integralImages(img)
+    mean,variance=localMeanVariance(sats,ksize)
+    rowIndex,colIndex=windowArgmin(variance,ksize)
+    return mean[rowIndex,colIndex]
+
+'''
+Minimum variance smoothing for several window sizes, from one pair of integral images (to tune ksize)
+Output: dictionary ksize -> float32 smoothed image
+'''
+def minVarianceSweep(img,ksizes):
+    sats=integralImages(img)
+    return {ksize:minVarianceSmoothing(None,ksize,sats) for ksize in ksizes}
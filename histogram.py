@@ -1,30 +1,102 @@
 import sys
-import matplotlib.pyplot as plt
+import weakref
+import functools
 import numpy as np
 
 import config
 
+chunkPixels=1<<20                  # pixels counted at once, bounds the temporary memory of np.bincount
+_histCache={}                      # id of image matrix -> (weak reference to the matrix, version, maxGray, histogram)
+
+'''
+Creates an 1-D histogram from an image matrix, without touching the global variables in config.
+Inputs: A       - a 2-D gray image, 8-bit or 16-bit
+        maxGray - maximum intensity possible in the image, default 255
+        mask    - optional boolean matrix of the same shape as A. Only pixels where mask is True are counted
+        roi     - optional region of interest (startRow,endRow,startCol,endCol). Only pixels inside it are counted
+Output: numpy array with frequency of each of the 0 to maxGray intensity levels
+Logic : np.bincount counts all intensities of a block of rows in one pass. It widens the pixels to 64-bit integers,
+        so the image is counted in blocks of about chunkPixels pixels to keep that copy small. The largest intensity
+        is known from the length of the counts, so no separate pass is needed to check it against maxGray.
+'''
+def computeHistogram(A,maxGray=255,mask=None,roi=None):
+    A=np.asarray(A)
+    if roi is not None:
+        startRow,endRow,startCol,endCol=roi
+        A=A[startRow:endRow,startCol:endCol]
+        if mask is not None:
+            mask=np.asarray(mask)[startRow:endRow,startCol:endCol]
+    if mask is not None:
+        A=A[mask]                      # boolean indexing returns the selected pixels as 1-D array
+    if A.ndim==2:
+        step=max(1,chunkPixels//max(1,A.shape[1]))
+        blocks=(A[start:start+step] for start in range(0,A.shape[0],step))   # blocks of rows
+    else:
+        A=A.reshape(-1)
+        blocks=(A[start:start+chunkPixels] for start in range(0,A.size,chunkPixels))
+
+    hist=np.zeros(maxGray+1,dtype=np.intp)
+    for block in blocks:
+        block=block.ravel()            # no copy for contiguous rows
+        if block.dtype.kind not in 'ui':   # bincount counts non-negative integers only
+            block=block.astype(int)
+        counts=np.bincount(block)
+        if len(counts)>maxGray+1:
+            sys.exit("intensity "+str(len(counts)-1)+" is more than maxGray "+str(maxGray))
+        hist[:len(counts)]+=counts
+    return hist
+
+'''
+Creates one 1-D histogram for each chanel of a color image
+Inputs: img - rows x columns x chanels image. mask, roi and maxGray are same as computeHistogram
+Output: chanels x (maxGray+1) numpy array, one histogram in each row
+'''
+def channelHistograms(img,maxGray=255,mask=None,roi=None):
+    return np.stack([computeHistogram(img[:,:,c],maxGray,mask,roi) for c in range(img.shape[2])])
+
+'''
+Same as computeHistogram, but repeated calls with the same matrix and version return the histogram of the first call.
+Opt-in, for callers that track changes to their pixels. createHistogram is not cached, and PGMImage.hist caches the
+histogram of each PGMImage until PGMImage.invalidate is called.
+Inputs: A       - a 2-D gray image (a numpy array, not a list)
+        version - any value the caller changes every time pixels of A are modified in place, e.g. a counter.
+                  The cache can not see such changes by itself, so there is no default.
+        maxGray - maximum intensity possible in the image, default 255
+Output: read-only numpy array with frequency of each of the 0 to maxGray intensity levels
+Logic : the cache is keyed on the identity of A, and an entry is dropped as soon as A is garbage collected
+'''
+def cachedHistogram(A,version,maxGray=255):
+    key=id(A)
+    entry=_histCache.get(key)
+    if entry is not None and entry[0]() is A and entry[1]==version and entry[2]==maxGray:
+        return entry[3]
+
+    hist=computeHistogram(A,maxGray)
+    hist.flags.writeable=False         # shared between callers, so no caller may change it
+    def drop(ref,key=key):             # A is collected, unless its id is already used by a newer entry
+        if _histCache.get(key,(None,))[0] is ref:
+            del _histCache[key]
+    _histCache[key]=(weakref.ref(A,drop),version,maxGray,hist)
+    return hist
+
 '''
 Creates an 1-D histogram from the image matrix
 Indices of the 1-D array represent each of 0 to L-1 intensity levels possible
 Frequency of each level is stored in corresponding indices.
 
 Input: img - a 2-D gray image. If no image is passed, default is taken from config.A
+The histogram is computed on every call, see cachedHistogram and PGMImage.hist for cached histograms.
                        
 '''
 def createHistogram(img=0):
     if type(img) == np.ndarray:
-        config.maxGray=255
-        config.A=img.astype(int)
+        config.maxGray=65535 if img.dtype==np.uint16 else 255
+        config.A=img
         shape=img.shape
         config.rows=shape[0]
         config.columns=shape[1]
           
-    config.hist=[0 for _ in range(config.maxGray+1)] # initialise histogram size to MaxGray and set all frequencies to 0
-
-    for i in range(config.rows):
-        for j in range(config.columns):
-            config.hist[config.A[i,j]] += 1
+    config.hist=computeHistogram(config.A,config.maxGray)
 
     if type(img) == np.ndarray:
         return config.hist
@@ -49,10 +121,12 @@ Inputs : data : A numpy array with number of pixels for intensities populated wh
                 Default : plot is shown, not saved
          ylabel : To be used for plotting other similar data apart from histogram
                 Default : Intnsity
+matplotlib is imported only when a plot is made, so headless code using this module never loads it.
 '''
 def plotHistogram(data=0,file=0,ylabel=0):
+    import matplotlib.pyplot as plt
 
-    if data == 0:
+    if type(data) == int:
         data=config.hist
     if ylabel==0:
         ylabel='# of pixels'
@@ -83,56 +157,134 @@ def plotHistogram(data=0,file=0,ylabel=0):
         plt.savefig(file[:-4]+'_histogram.png')
         
 '''
-Does global histogram equalizetion using formula g(x,y)=255*(f(x,y)-Lmin)/(Lmax-Lmin)
+Transfer functions of the histogram equalizations below. Each maps intensities x of an image with minimum
+intensity minGray and maximum intensity maxGray to values, that are divided by the value at maxGray to get the
+output in range 0 to 1.
+'''
+_transfers={
+    'linear'   : lambda x,minGray,maxGray: (x-minGray)/(maxGray-minGray),
+    'square'   : lambda x,minGray,maxGray: np.square((x-minGray)/maxGray),
+    'root'     : lambda x,minGray,maxGray: np.floor(np.sqrt(x-minGray)),
+    '1plusxsq' : lambda x,minGray,maxGray: 1-(1/(np.square(6*(x-minGray)/maxGray)+1)),
+}
+
+'''
+Transfer function evaluated for intensities x, scaled to 0 to outMax. 0 if the transfer function is 0 at maxGray
+(e.g. an image with a single intensity).
+'''
+def _transfer(name,x,minGray,maxGray,outMax):
+    with np.errstate(divide='ignore',invalid='ignore'):
+        top=_transfers[name](np.float64(maxGray),minGray,maxGray)
+        if not top>0:
+            return np.zeros(np.shape(x))
+        return np.clip(_transfers[name](np.maximum(x,minGray),minGray,maxGray)/top,0,1)*outMax
+
 '''
-def equalizeHistogramLinear(greyImg):
+Look up table of a histogram equalization transfer function
+Inputs: name    : 'linear', 'square', 'root' or '1plusxsq'
+        minGray : minimum intensity of the image
+        maxGray : maximum intensity of the image
+        levels  : number of entries, 256 for 8-bit and 65536 for 16-bit images
+        outMax  : maximum output intensity, default 255
+Output: read-only look up table of size levels, uint8 (uint16 if outMax > 255)
+Logic : the transfer function is computed once for each intensity, instead of for each pixel.
+        Tables are cached for each (name, minGray, maxGray, levels, outMax).
+'''
+@functools.lru_cache(maxsize=256)
+def transferLUT(name,minGray,maxGray,levels=256,outMax=255):
+    lut=np.round(_transfer(name,np.arange(levels,dtype=np.float64),minGray,maxGray,outMax))
+    lut=lut.astype(np.uint8 if outMax<256 else np.uint16)
+    lut.flags.writeable=False
+    return lut
+
+'''
+Apply a histogram equalization transfer function to an image
+Inputs: name    : 'linear', 'square', 'root' or '1plusxsq'
+        greyImg : gray image
+        out     : optional preallocated output matrix of the shape of greyImg, uint8 (uint16 if outMax > 255)
+        outMax  : maximum output intensity, default 255
+Output: equalized image
+Logic : integer images with intensities 0 to 65535 are mapped through a look up table of 256 or 65536 entries
+        with a single np.take, other images (float, negative or wider intensities) are transformed pixel by pixel
+'''
+def equalizeHistogramLUT(name,greyImg,out=None,outMax=255):
+    greyImg=np.asarray(greyImg)
     minGray=np.min(greyImg)
-    config.A87=(greyImg-minGray)/(np.max(greyImg)-minGray)*255
+    maxGray=np.max(greyImg)
+    if not np.issubdtype(greyImg.dtype,np.integer) or minGray<0 or maxGray>=65536:
+        img=_transfer(name,greyImg,minGray,maxGray,outMax)
+        if out is None:
+            return img
+        out[...]=np.round(img)
+        return out
+
+    minGray,maxGray=int(minGray),int(maxGray)                # hashable keys for the look up table cache
+    levels=256 if maxGray<256 else 65536
+    lut=transferLUT(name,minGray,maxGray,levels,outMax)
+    return np.take(lut,greyImg,out=out)
+
+'''
+Does global histogram equalizetion using formula g(x,y)=255*(f(x,y)-Lmin)/(Lmax-Lmin)
+'''
+def equalizeHistogramLinear(greyImg,out=None):
+    config.A87=equalizeHistogramLUT('linear',greyImg,out)
     return config.A87
 
 '''
 Does global histogram equalizetion using formula g(x,y)=255*(f(x,y)-Lmin)^2/(Lmax-Lmin)
 '''
-def equalizeHistogramSquare(greyImg):
-    minGray=np.min(greyImg)
-    maxGray=np.max(greyImg)
-    imgNorm=(greyImg-minGray)/maxGray
-    imgSquare=np.square(imgNorm)
-    config.A876=imgSquare/np.max(imgSquare)*255
+def equalizeHistogramSquare(greyImg,out=None):
+    config.A876=equalizeHistogramLUT('square',greyImg,out)
     return config.A876
 
 '''
 Does global histogram equalizetion using formula g(x,y)=255*(f(x,y)-Lmin)^0.5/(Lmax-Lmin)
 '''
-def equalizeHistogramRoot(greyImg):
-    minGray=np.min(greyImg)
-    maxGray=np.max(greyImg)
-    imgSqrt=np.sqrt(greyImg-minGray)
-    imgSqrt=imgSqrt.astype(int)
-    config.A876=imgSqrt/np.max(imgSqrt)*255
+def equalizeHistogramRoot(greyImg,out=None):
+    config.A876=equalizeHistogramLUT('root',greyImg,out)
     return config.A876 
 
 '''
 Equalise histogram with transform function 1-1/(1+6x^2)
 '''
-def equalizeHistogram1plusxsq(greyImg):
-    minGray=np.min(greyImg)
-    maxGray=np.max(greyImg)
-    imgNorm=(greyImg-minGray)/maxGray
-    img=1-(1/(np.square(6*imgNorm)+1))
-    config.A876=img/np.max(img)*255
+def equalizeHistogram1plusxsq(greyImg,out=None):
+    config.A876=equalizeHistogramLUT('1plusxsq',greyImg,out)
     return config.A876 
 
 '''
 Equalise histogram - creates a flat histogram
+Inputs: greyImg : gray image
+        seed    : optional seed of the random generator used to order pixels of equal intensity
+        out     : optional preallocated uint8 output matrix of the shape of greyImg. If it is not C-contiguous (e.g. a
+                  slice of a larger image) the result is computed in a temporary matrix and copied to out
+Output: image with (almost) the same number of pixels in each of the 256 intensities
+Logic : pixels are ranked by intensity, pixels of equal intensity in random order, and the pixel with rank r gets
+        intensity 256*r/N, N = number of pixels.
+        Random order of equal intensities is made by shuffling the pixel indices once and then sorting them by intensity
+        with a stable sort, which numpy does by counting (radix) sort for 8-bit and 16-bit images: O(N+L) in total.
+        Output intensities in rank order are a non decreasing sequence, created with np.repeat from the number of
+        ranks for each intensity, so no array of ranks is needed.
 '''
-def equalizeHistogramFlat(greyImg):
+def equalizeHistogramFlat(greyImg,seed=None,out=None):
+    img=np.asarray(greyImg)
+    N=img.size
+    rng=np.random.default_rng(seed)
+
+    idx=np.arange(N,dtype=np.int32 if N<2**31 else np.int64)
+    rng.shuffle(idx)                                      # random order of pixels, in place
+    flat=img.ravel()
+    order=idx[np.argsort(flat[idx],kind='stable')]        # pixel indices sorted by intensity, ties in random order
+    del idx
 
-    imgran=greyImg+np.random.uniform(-1,+1,greyImg.shape) # Add random noise
-    imgflat=imgran.flatten()                              # flatten the matrix to 1-D for transformation
-    imgsort=np.argsort(imgflat)                           # get sorted order of each intensity
-    bin=len(imgsort)//255                                 # set bin size for histogram as total # of pixels/total # of different intensity levels 
-    for i in range(len(imgsort)):                         # spread intensity of all pixels in order of their rank in the sorted array from 0 to 255
-        imgflat[imgsort[i]]=i//bin
-    imgspectrum=imgflat.reshape(greyImg.shape)
-    return imgspectrum
+    first=-(-np.arange(257)*N//256)                       # first rank of each output intensity = ceil(v*N/256)
+    values=np.repeat(np.arange(256,dtype=np.uint8),np.diff(first)) # output intensity of each rank
+
+    if out is None:
+        out=np.empty(img.shape,dtype=np.uint8)
+    if out.flags.c_contiguous:
+        out.reshape(-1)[order]=values                     # reshape(-1) is a view for a contiguous buffer
+    else:
+        tmp=np.empty(img.shape,dtype=np.uint8)            # reshape(-1) of out would be a copy, writes to it would be lost
+        tmp.reshape(-1)[order]=values
+        out[...]=tmp
+    return out
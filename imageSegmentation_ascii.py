@@ -3,7 +3,7 @@ import sys
 import config
 from readP2file import readfile
 from histogram import  createHistogram,plotHistogram
-from threshold import thresholdHalf,thresholdMeanOfMeans,thresholdOtsu
+from threshold import selectThresholds,segmentAll
 from matrix_to_binary import creatBinaryeFile
 
 if __name__=='__main__':
@@ -15,14 +15,13 @@ if __name__=='__main__':
     readfile(sys.argv[1])      # store input image intensities to global matrix A
 
     createHistogram()          # create 1-D histogram from image
-    plotHistogram(sys.argv[1]) # save the histogram
+    plotHistogram(config.hist,sys.argv[1]) # save the histogram
 
-    SA=thresholdHalf()         # segment image with threshold = L/2
-    creatBinaryeFile(sys.argv[1][:-4]+'_segmented half'+sys.argv[1][-4:],SA,config.rows,config.columns,config.maxGray)
+    T=selectThresholds(config.hist,config.maxGray) # thresholds L/2, mean of means and Otsu's method, from one pass over the histogram
+    print("final threshold (mean of means) = ",T['mom'])
+    print("final threshold (Otsu)= ",T['otsu'])
 
-    SA=thresholdMeanOfMeans()  # segment image with mean of mean threshold
-    creatBinaryeFile(sys.argv[1][:-4]+'_segmented mom'+sys.argv[1][-4:],SA,config.rows,config.columns,config.maxGray)
-    
-    SA=thresholdOtsu()        # segment image with Otsu's thresholding method
-    creatBinaryeFile(sys.argv[1][:-4]+'_segmented Otsu'+sys.argv[1][-4:],SA,config.rows,config.columns,config.maxGray)
-    
+    SA=segmentAll(config.A,[T['half'],T['mom'],T['otsu']]) # segment image with all three thresholds in one pass over the pixels
+    creatBinaryeFile(sys.argv[1][:-4]+'_segmented half'+sys.argv[1][-4:],SA[0],config.rows,config.columns,config.maxGray)
+    creatBinaryeFile(sys.argv[1][:-4]+'_segmented mom'+sys.argv[1][-4:],SA[1],config.rows,config.columns,config.maxGray)
+    creatBinaryeFile(sys.argv[1][:-4]+'_segmented Otsu'+sys.argv[1][-4:],SA[2],config.rows,config.columns,config.maxGray)
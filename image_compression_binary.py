@@ -5,8 +5,9 @@ import sys
 import numpy as np
 from readP5file import readfile
 import config
-from bitSlicing import slice_bits8,merge_bits_87,merge_bits_876
-from matrix_to_binary import creatbinaryeFile
+from bitSlicing import packedPlane
+from matrix_to_binary import creatBinaryeFile
+from matrix_to_bitmap import createBitmapFile
 
 '''
 This is the main program that takes a file name from the command line argument, if it is in valid P5 .pgm format, then reads
@@ -21,14 +22,13 @@ if __name__=='__main__':
     print('rows=',config.rows,' columns=',config.columns)
     print(config.A)
 
-    slice_bits8()
-#    print('Sliced matrices are created!')
-    for i in range(8):
-        creatbinaryeFile(sys.argv[1][:-4]+'_b'+str(8-i)+sys.argv[1][-4:],config.bitList[i],config.rows,config.columns,1)
+    for i in range(8):                # each bit plane is written as a packed bitmap, 8 pixels in a byte
+        createBitmapFile(sys.argv[1][:-4]+'_b'+str(8-i)+'.pbm',packedPlane(config.A,7-i),config.rows,config.columns)
 
-#    print('8 ascii files are created!')
-    merge_bits_87()
+#    print('8 bitmap files are created!')
+    A=np.asarray(config.A,dtype=np.uint8)
+    config.A87=A>>6                   # bits 8 and 7 as a 2 bit number, same as merge_bits_87 without slicing all planes
 #    print('merges bit 8 and bit 7')
-    creatbinaryeFile(sys.argv[1][:-4]+'_b87'+sys.argv[1][-4:],config.A87,config.rows,config.columns,3)
-    merge_bits_876()
-    creatbinaryeFile(sys.argv[1][:-4]+'_b876'+sys.argv[1][-4:],config.A876,config.rows,config.columns,7)
+    creatBinaryeFile(sys.argv[1][:-4]+'_b87'+sys.argv[1][-4:],config.A87,config.rows,config.columns,3)
+    config.A876=A>>5                  # bits 8, 7 and 6
+    creatBinaryeFile(sys.argv[1][:-4]+'_b876'+sys.argv[1][-4:],config.A876,config.rows,config.columns,7)
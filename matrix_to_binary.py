@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os                      # for temporary file replacement
 import sys                     # for system exit in case of errors
+import threading               # to name the temporary file uniquely
 import numpy as np             # to store the matrix in numpy array
 import config
 
@@ -11,17 +13,57 @@ Create a portable gray map P5 (binary) format file from a matrix
 Inputs: A        : the pixel matrix
         rows     : number of rows in A
         columns  : number of columns in A
-        maxGray  : maximum gray bit range
-        filename : name of the output file
-Output: the .pgm file with the filename, the matrix pixels encoded in binary in it. 
+        maxGray  : maximum gray bit range. 1 byte per pixel if maxGray < 256, else 2 bytes, most significant byte first
+        filename : name of the output file, or an already open binary file object (e.g. io.BytesIO for in-process pipelines)
+Output: the .pgm file with the filename, the matrix pixels encoded in binary in it.
+        Exits if A is not an integer matrix or has values outside 0 to maxGray, instead of writing wrapped values.
+Logic : the header is written, then the whole matrix in a single write through the buffer protocol.
+        A named file is written atomically, see writeFile.
+        The range is checked only when the type of A can hold values outside it, e.g. not for uint8 with maxGray 255.
 '''
 def creatBinaryeFile(filename,A,rows,columns,maxGray):
+    A=np.asarray(A)
+    if A.dtype.kind not in 'uib':
+        sys.exit("pixel values must be integers, not "+str(A.dtype))
+    if not 0<maxGray<65536:
+        sys.exit("maxGray "+str(maxGray)+" is not in 1 to 65535")
+    if A.size:
+        if A.dtype.kind=='i' and A.min()<0:
+            sys.exit("pixel value "+str(A.min())+" is negative")
+        if A.dtype.kind!='b' and np.iinfo(A.dtype).max>maxGray and A.max()>maxGray:
+            sys.exit("pixel value "+str(A.max())+" is more than maxGray "+str(maxGray))
+    dtype=np.uint8 if maxGray<256 else np.dtype('>u2')
+    data=np.ascontiguousarray(A,dtype=dtype)                            # no copy if A is already in the output format
+    if data.shape!=(rows,columns):
+        sys.exit("matrix is not of size "+str(rows)+" x "+str(columns))
+    header=("P5\n"+str(columns)+' '+str(rows)+'\n'+str(maxGray)+'\n').encode('ascii') # magic number, columns, rows and maxgray
+
+    writeFile(filename,header,data)
+
+'''
+Write a header and a numpy array to a file
+Inputs: filename : name of the output file, or an already open binary file object
+        header   : bytes to be written before the array
+        data     : contiguous numpy array, written as it is in memory
+Logic : A named file is written to a temporary file in the same directory and renamed to filename at the end,
+        so readers never see a partially written file.
+'''
+def writeFile(filename,header,data):
+    if hasattr(filename,'write'):                                       # already open file object
+        try:
+            filename.write(header)
+            filename.write(memoryview(data).cast('B'))                  # no copy of the pixel data
+        except:
+            sys.exit("Error in writing to file object")
+        return
+
+    tmp=str(filename)+'.'+str(os.getpid())+'.'+str(threading.get_ident())+'.tmp' # unique per process and thread, in the same directory
     try:
-        with open(filename,'wb') as f:                                  # open the file in binary write mode
-            f.write(bytearray("P5\n",'utf-8'))                          # encoded magic number
-            f.write(bytearray(str(columns)+' '+str(rows)+'\n', 'utf-8'))# encoded column and row information, separated by whitespace
-            f.write(bytearray(str(maxGray)+'\n','utf-8'))               # encoded maxgray information
-            for row in range(rows):
-                f.write(bytearray(list(A[row])))                        # encoded each row of the matrix in a single line
-    except:                                       
-        sys.exit("Error in writing to file "+sys.argv[1])               # exit if any error
+        with open(tmp,'wb') as f:                                       # open the file in binary write mode
+            f.write(header)
+            data.tofile(f)
+        os.replace(tmp,filename)                                        # atomic rename to the final name
+    except:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        sys.exit("Error in writing to file "+str(filename))             # exit if any error
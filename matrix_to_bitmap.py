@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sys                     # for system exit in case of errors
+import numpy as np             # to store the matrix in numpy array
+from matrix_to_binary import writeFile
+
+
+'''
+Create a portable bitmap P4 (packed binary) format file from a matrix of bits
+Inputs: P        : the bit matrix. Either packed, rows x ceil(columns/8) bytes as returned by np.packbits(bits,axis=1)
+                   or bitSlicing.packedPlane, or unpacked, rows x columns with values 0 and 1
+        rows     : number of rows in the image
+        columns  : number of columns in the image
+        filename : name of the output file, or an already open binary file object
+        packed   : True if P is already packed, default True
+Output: the .pbm file with the filename, 8 pixels in each byte, so 8 times smaller than a P5 file with maxGray=1.
+        Bits are written inverted, because pbm viewers show a bit 1 as black: a bit 1 of P is shown white,
+        the same as in a P5 file with maxGray=1.
+'''
+def createBitmapFile(filename,P,rows,columns,packed=True):
+    if not packed:
+        P=np.packbits(np.asarray(P,dtype=np.uint8),axis=1)         # 8 pixels in each byte, rows padded with 0 bits to full bytes
+    data=np.asarray(P,dtype=np.uint8)
+    if data.shape!=(rows,(columns+7)//8):
+        sys.exit("bit matrix is not of size "+str(rows)+" x "+str(columns))
+    data=np.invert(data)                                            # new contiguous array, P is not changed
+    header=("P4\n"+str(columns)+' '+str(rows)+'\n').encode('ascii')  # magic number, columns and rows. No maxgray for bitmaps
+    writeFile(filename,header,data)
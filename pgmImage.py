@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sys
+import readP2file
+import readP5file
+from histogram import computeHistogram
+from threshold import applyThreshold,meanOfMeansThreshold,otsuThreshold
+from bitSlicing import slicePlanes,mergeBits
+from matrix_to_binary import creatBinaryeFile
+from matrix_to_ascii import createASCIIFile
+
+'''
+A gray image with its pixels, dimensions, maxGray and cached derived data (histogram, bit planes).
+
+This is the re-entrant counterpart of the global variables in config.py: every PGMImage carries its
+own state, so several images can be processed at the same time in threads or in a process pool.
+
+Usage : img=PGMImage.fromFile('image.pgm')
+        SA=img.thresholdOtsu()
+        creatBinaryeFile('image_segmented.pgm',SA,img.rows,img.columns,img.maxGray)
+'''
+class PGMImage:
+    __slots__=('A','rows','columns','maxGray','_hist','_bitList')
+
+    def __init__(self,A,maxGray=255):
+        self.A=A                       # image pixel intensity matrix
+        self.rows,self.columns=A.shape # number of rows and columns in image intensity matrix
+        self.maxGray=maxGray           # maximum intensity possible in image
+        self._hist=None                # 1-D histogram, created when first used
+        self._bitList=None             # bit sliced matrices, created when first used
+
+    '''
+    Reads a P2 (ASCII) or P5 (binary) pgm file. P5 pixels are memory mapped, not read into memory.
+    '''
+    @classmethod
+    def fromFile(cls,filename):
+        try:
+            with open(filename,'rb') as f:
+                magicNumber=f.read(2)
+        except:
+            sys.exit("invalid PGM format")
+
+        if magicNumber==b'P5':
+            A,maxGray=readP5file.mapfile(filename)
+        elif magicNumber==b'P2':
+            A,maxGray=readP2file.loadfile(filename)
+        else:
+            sys.exit("invalid PGM file")
+        return cls(A,maxGray)
+
+    '''
+    Clears the cached histogram and bit planes. To be called after the pixels in A are changed.
+    '''
+    def invalidate(self):
+        self._hist=None
+        self._bitList=None
+
+    @property
+    def hist(self):
+        if self._hist is None:
+            self._hist=computeHistogram(self.A,self.maxGray)
+        return self._hist
+
+    '''
+    Bit sliced matrices, one for each bit of maxGray (8 for 8-bit, up to 16 for 16-bit images), most significant first
+    '''
+    @property
+    def bitList(self):
+        if self._bitList is None:
+            self._bitList=list(slicePlanes(self.A,max(1,int(self.maxGray).bit_length())))
+        return self._bitList
+
+    def threshold(self,T):
+        return applyThreshold(self.A,T)
+
+    def thresholdHalf(self):
+        return applyThreshold(self.A,self.maxGray/2)
+
+    def thresholdMeanOfMeans(self,Trange=1):
+        return applyThreshold(self.A,meanOfMeansThreshold(self.hist,self.maxGray,Trange))
+
+    '''
+    Threshold based on Otsu's method. With diagnostics=True, the inter-class variance for each hypothesis threshold
+    is returned along with the image
+    '''
+    def thresholdOtsu(self,diagnostics=False):
+        k,splot=otsuThreshold(self.hist)
+        if diagnostics:
+            return applyThreshold(self.A,k),splot
+        return applyThreshold(self.A,k)
+
+    '''
+    Merges the n most significant bits to produce a visible image, e.g. n=2 gives config.A87, n=3 gives config.A876
+    for an 8-bit image
+    '''
+    def mergeBits(self,n):
+        return mergeBits(self.bitList,n)
+
+    def writeBinary(self,filename):
+        creatBinaryeFile(filename,self.A,self.rows,self.columns,self.maxGray)
+
+    def writeASCII(self,filename):
+        createASCIIFile(self.A,self.rows,self.columns,self.maxGray,filename)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import queue
+import threading
+import cv2 as cv
+
+'''
+Pipeline of three stages connected by bounded queues, so reading image k+1, computing on image k and encoding/writing
+the outputs of image k-1 overlap (OpenCV and NumPy release the GIL while decoding, computing and encoding).
+
+    reader thread  : data=read(item) for each item
+    calling thread : outputs=compute(item,data)
+    writer thread  : write(outputs)
+
+The compute stage runs in the thread that calls runPipeline, so it can use matplotlib and the globals of config.py.
+Each queue holds at most depth items, so at most about 2*depth+3 images are in memory at a time.
+An error (or sys.exit) in any stage stops the pipeline and is raised again by runPipeline.
+'''
+
+_end=object()                  # marks the end of the items in a queue
+
+class _Stopped(Exception):
+    pass
+
+'''
+Put x in queue q, waiting while the queue is full, unless another stage failed
+'''
+def _put(q,x,failed):
+    while True:
+        try:
+            q.put(x,timeout=0.1)
+            return
+        except queue.Full:
+            if failed.is_set():
+                raise _Stopped()
+
+'''
+Get the next element of queue q, waiting while the queue is empty, unless another stage failed
+'''
+def _get(q,failed):
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if failed.is_set():
+                raise _Stopped()
+
+'''
+Read an image file with cv.imread, exit if it cannot be read. flags as for cv.imread (0 for grey level).
+'''
+def readImage(filename,flags=cv.IMREAD_COLOR):
+    img=cv.imread(filename,flags)
+    if img is None:
+        raise SystemExit("Could not read the image "+filename)
+    return img
+
+'''
+Write a list of (file name, image) pairs with cv.imwrite
+'''
+def writeImages(outputs):
+    for filename,img in outputs:
+        if not cv.imwrite(filename,img):
+            raise SystemExit("Could not write the image "+filename)
+
+'''
+Run read, compute and write over all items, in overlapping stages
+Inputs: items   : e.g. list of file names
+        read    : function(item) -> data, default readImage
+        compute : function(item, data) -> outputs
+        write   : function(outputs), default writeImages (outputs is a list of (file name, image) pairs)
+        depth   : maximum number of items waiting between two stages, default 2
+Output: number of items processed
+'''
+def runPipeline(items,compute,read=readImage,write=writeImages,depth=2):
+    readQueue=queue.Queue(depth)
+    writeQueue=queue.Queue(depth)
+    failed=threading.Event()
+    errors=[]
+
+    def stage(body):
+        def run():
+            try:
+                body()
+            except _Stopped:
+                pass
+            except BaseException as e:                  # includes SystemExit from sys.exit
+                errors.append(e)
+                failed.set()
+        return threading.Thread(target=run,daemon=True)
+
+    def reader():
+        for item in items:
+            _put(readQueue,(item,read(item)),failed)
+        _put(readQueue,_end,failed)
+
+    def writer():
+        while True:
+            outputs=_get(writeQueue,failed)
+            if outputs is _end:
+                return
+            write(outputs)
+
+    threads=[stage(reader),stage(writer)]
+    for t in threads:
+        t.start()
+
+    count=0
+    try:
+        while True:
+            job=_get(readQueue,failed)
+            if job is _end:
+                break
+            _put(writeQueue,compute(*job),failed)
+            count+=1
+        _put(writeQueue,_end,failed)
+    except _Stopped:
+        pass
+    except BaseException as e:
+        errors.append(e)
+        failed.set()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    return count
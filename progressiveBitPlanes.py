@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sys
+import numpy as np
+from readP5file import readHeader
+from bitSlicing import slicePlanes,mergePlanes
+from matrix_to_binary import writeFile
+
+'''
+Progressive bit plane container, to show a preview of an image from its most significant bits first
+(like config.A87 and config.A876 of image_compression_binary.py) and refine it as more planes are read.
+
+File layout:
+    PB\n<columns> <rows>\n<maxGray>\n        header, same syntax as a pgm header
+    index                                   for each bit plane, most significant first, 2 big-endian uint64 numbers:
+                                            offset of the plane from the start of the file and its length in bytes
+    planes                                  bit planes packed 8 pixels in a byte (as np.packbits(...,axis=1)),
+                                            most significant first
+Number of bit planes = number of bits in maxGray. Since planes are stored most significant first, the top k planes
+are one contiguous block, read with a single seek and read. Streams that can not seek (e.g. a HTTP response body)
+are read forward only.
+'''
+
+magicNumber='PB'
+
+'''
+Write an image matrix A to a progressive bit plane file
+Inputs: filename : name of the output file, or an already open binary file object
+        A        : image matrix, 8-bit or 16-bit
+        maxGray  : maximum intensity possible in the image
+'''
+def createProgressiveFile(filename,A,maxGray):
+    bits=max(1,int(maxGray).bit_length())
+    planes=slicePlanes(A,bits,packed=True)                      # bits x rows x ceil(columns/8)
+    rows,columns=np.shape(A)
+    header=(magicNumber+'\n'+str(columns)+' '+str(rows)+'\n'+str(maxGray)+'\n').encode('ascii')
+
+    planeBytes=planes[0].nbytes
+    start=len(header)+bits*16                                   # planes start after the header and the index
+    index=np.empty((bits,2),dtype='>u8')
+    index[:,0]=start+planeBytes*np.arange(bits)
+    index[:,1]=planeBytes
+    writeFile(filename,header+index.tobytes(),planes)
+
+'''
+Read length bytes at offset of an open binary file object f
+Seekable files seek to offset. Other streams can only move forward: the bytes from the current position to offset
+are read and dropped. If the position of the stream is not known (f.tell fails), it is taken to be at the first
+plane, which directly follows the index in files written by createProgressiveFile.
+'''
+def _readAt(f,offset,length):
+    if f.seekable():
+        f.seek(offset)
+    else:
+        try:
+            position=f.tell()
+        except (OSError,AttributeError):
+            position=offset
+        if position>offset:
+            sys.exit("can not read back in a stream")
+        _readExactly(f,offset-position)                         # skip forward
+    return _readExactly(f,length)
+
+'''
+Read exactly length bytes, streams may return fewer bytes in one read
+'''
+def _readExactly(f,length):
+    data=bytearray()
+    while len(data)<length:
+        chunk=f.read(length-len(data))
+        if not chunk:
+            sys.exit("invalid progressive bit plane file, data ends early")
+        data+=chunk
+    return bytes(data)
+
+'''
+Read header and index of a progressive bit plane file, f is an open binary file object
+Output: columns, rows, maxGray, index (bits x 2 array of plane offsets and lengths)
+'''
+def readProgressiveHeader(f):
+    magic,columns,rows,maxGray=readHeader(f)
+    if magic!=magicNumber:
+        sys.exit("invalid progressive bit plane file")
+    bits=max(1,maxGray.bit_length())
+    index=np.frombuffer(_readExactly(f,bits*16),dtype='>u8').reshape(bits,2)
+    return columns,rows,maxGray,index
+
+'''
+Read the k most significant bit planes of a progressive bit plane file
+Inputs: f : an open binary file object, seekable or not
+        k : number of planes to read, at most the number of bits in maxGray
+Output: k x rows x columns uint8 array with values 0 and 1, most significant bit first, and maxGray
+Logic : the top k planes are contiguous, so only those bytes are read from the file, with one seek and one read
+'''
+def readTopPlanes(f,k):
+    columns,rows,maxGray,index=readProgressiveHeader(f)
+    k=min(k,len(index))
+    data=_readAt(f,int(index[0,0]),int(index[:k,1].sum()))
+    planes=np.frombuffer(data,dtype=np.uint8).reshape(k,rows,(columns+7)//8)
+    return np.unpackbits(planes,axis=2,count=columns),maxGray
+
+'''
+Combine the k most significant bit planes to an image in the intensity range of the full image.
+Lower bits not yet known are set to the middle of their range, which is the closest guess on average.
+'''
+def previewImage(planes,bits):
+    k=len(planes)
+    img=mergePlanes(planes,range(k)).astype(np.uint16 if bits>8 else np.uint8)
+    img<<=bits-k                                                # top k bits in place
+    if k<bits:
+        img|=1<<(bits-k-1)                                      # middle of the range of the unknown bits
+    return img
+
+'''
+Read a preview of an image from its k most significant bit planes
+Inputs: filename : name of a progressive bit plane file, or an open binary file object (e.g. a HTTP response body)
+        k        : number of planes to use, 1 gives the coarsest preview, number of bits in maxGray the exact image
+Output: rows x columns preview image, maxGray
+'''
+def readPreview(filename,k):
+    if hasattr(filename,'read'):
+        planes,maxGray=readTopPlanes(filename,k)
+    else:
+        try:
+            f=open(filename,'rb')
+        except:
+            sys.exit("could not open "+str(filename))
+        with f:
+            planes,maxGray=readTopPlanes(f,k)
+    return previewImage(planes,max(1,maxGray.bit_length())),maxGray
+
+'''
+Generator of previews refined one bit plane at a time, for a viewer that shows the image while it is being read
+Input : filename : name of a progressive bit plane file
+Output: yields (k, preview image from the top k planes) for k = 1 to number of bits in maxGray
+Logic : every plane is read exactly once, and the preview is refined in place with the new plane
+'''
+def previews(filename):
+    try:
+        f=open(filename,'rb')
+    except:
+        sys.exit("could not open "+str(filename))
+    with f:
+        columns,rows,maxGray,index=readProgressiveHeader(f)
+        bits=len(index)
+        img=np.zeros((rows,columns),dtype=np.uint16 if bits>8 else np.uint8)
+        for k in range(1,bits+1):
+            plane=np.frombuffer(_readAt(f,int(index[k-1,0]),int(index[k-1,1])),dtype=np.uint8).reshape(rows,(columns+7)//8)
+            img|=np.unpackbits(plane,axis=1,count=columns).astype(img.dtype)<<(bits-k)  # add the bit of this plane
+            preview=img.copy()
+            if k<bits:
+                preview|=1<<(bits-k-1)                          # middle of the range of the unknown bits
+            yield k,preview
@@ -1,11 +1,88 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import re
 import sys
+import warnings
 import numpy as np
 import config
+from readP5file import readHeader
+
+chunkSize=1<<24              # number of bytes of pixel data tokenized at once
+
+'''
+Tokenizes a buffer of whitespace separated ASCII integers into a numpy array in a single call.
+Comments (from '#' till end of line) are removed before conversion.
+'''
+def tokenize(buf):
+    if b'#' in buf:
+        buf=re.sub(rb'#[^\n]*',b' ',buf)         # drop comments, if any
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')            # older numpy only warns on unparsable data, make it an error
+        try:
+            values=np.fromstring(buf,dtype=np.int64,sep=' ')
+        except:
+            sys.exit("invalid PGM format")
+    if len(values)==1 and buf.isspace():          # numpy parses a blank buffer as a single 0
+        return values[:0]
+    return values
+
+'''
+Reads a P2 (ASCII) pgm file.
+Inputs: filename  - name of the P2 file
+        chunkSize - number of bytes read and tokenized at once, default 16 MB
+Output: A       - rows x columns matrix of pixel intensities, uint8 or uint16 if maxGray > 255
+        maxGray - maximum intensity possible in the image
+Logic : The header is parsed once (comments are allowed anywhere in it), then the pixel data is read
+        in large chunks. Each chunk is cut at its last whitespace, so no number is split between chunks,
+        converted to integers in bulk and written straight into the preallocated matrix.
+'''
+def loadfile(filename,chunkSize=chunkSize):
+    try:
+        f=open(filename,'rb')
+    except:
+        sys.exit("invalid PGM format")
+
+    with f:
+        magicNumber,columns,rows,maxGray=readHeader(f)
+        if magicNumber!='P2':
+            sys.exit("invalid PGM file")
+
+        A=np.empty(rows*columns,dtype=np.uint8 if maxGray<256 else np.uint16)
+        pos=0                                     # number of pixels read so far
+        rest=b''                                  # incomplete number or comment carried over to the next chunk
+        while True:
+            chunk=f.read(chunkSize)
+            buf=rest+chunk
+            if chunk:
+                cut=len(buf)
+                while cut>0 and not buf[cut-1:cut].isspace(): # cut the buffer after its last whitespace
+                    cut-=1
+                line=buf.rfind(b'\n',0,cut)+1
+                if b'#' in buf[line:cut]:         # a comment in the last line may continue in the next chunk
+                    cut=line
+                buf,rest=buf[:cut],buf[cut:]
+            values=tokenize(buf)
+            if pos+len(values)>len(A):
+                sys.exit("invalid PGM format")
+            A[pos:pos+len(values)]=values
+            pos+=len(values)
+            if not chunk:
+                break
+
+    if pos!=len(A):
+        sys.exit("invalid PGM format")
+    return A.reshape(rows,columns),maxGray
 
 def readfile(filename):
+    config.A,config.maxGray=loadfile(filename)
+    config.rows,config.columns=config.A.shape
+    print('Rows =',config.rows,' Columns = ',config.columns,' maxGray = ',config.maxGray)
+
+'''
+Earlier line by line reader, kept for benchmarking against readfile
+'''
+def readfile_old(filename):
     m=[]
 
     try:
@@ -27,7 +104,7 @@ def readfile(filename):
                 sys.exit("invalid PGM format")
         config.columns,config.rows,config.maxGray=m[0:3]
         print('Rows =',config.rows,' Columns = ',config.columns,' maxGray = ',config.maxGray)
-        config.A=np.array(m[3:]).reshape(config.rows,config.columns)     
-       
+        config.A=np.array(m[3:]).reshape(config.rows,config.columns)
+
     else:
         sys.exit("invalid PGM file")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sys
+import numpy as np
+from readP5file import readHeader
+
+'''
+Maps the packed pixel data of a P4 (binary bitmap) file to a numpy memmap, without reading it into memory.
+Inputs: filename - name of the P4 file
+        startRow - first row to be mapped, default 0
+        endRow   - row after the last row to be mapped, default number of rows in the image
+Output: P       - read-only uint8 memmap of shape (endRow-startRow) x ceil(columns/8), 8 pixels in each byte,
+                  most significant bit first, same layout as np.packbits(bits,axis=1)
+        columns - number of pixels in each row
+'''
+def mapfile(filename,startRow=0,endRow=None):
+    try:
+        f=open(filename,'rb')
+    except:
+        sys.exit("invalid PBM format")
+
+    with f:
+        magicNumber,columns,rows,maxGray=readHeader(f)
+        offset=f.tell()      # pixel data starts right after the header
+
+    if magicNumber!='P4':
+        sys.exit("invalid PBM file")
+
+    if endRow is None:
+        endRow=rows
+    if not 0<=startRow<=endRow<=rows:
+        sys.exit("invalid row range "+str(startRow)+":"+str(endRow))
+
+    rowBytes=(columns+7)//8  # each row is padded to full bytes
+    if endRow==startRow:     # numpy can not map an empty range
+        return np.zeros((0,rowBytes),dtype=np.uint8),columns
+
+    P=np.memmap(filename,dtype=np.uint8,mode='r',offset=offset+startRow*rowBytes,shape=(endRow-startRow,rowBytes))
+    return P,columns
+
+'''
+Reads a P4 file into a rows x columns matrix with values 0 and 1, 1 for white (the bits given to
+matrix_to_bitmap.createBitmapFile)
+'''
+def loadfile(filename):
+    P,columns=mapfile(filename)
+    bits=np.unpackbits(P,axis=1,count=columns)
+    bits^=1                  # the file has 1 for black
+    return bits
@@ -3,7 +3,7 @@ import sys
 import config
 
 '''
-Function to read next uncommented line from the input file 
+Function to read next uncommented line from the input file
 '''
 def readnextUncommentedLine(f):
     comment = True           # Set parameter that identifies if the input line is a commnet line
@@ -15,34 +15,85 @@ def readnextUncommentedLine(f):
     return line              # return the first uncommneted line
 
 '''
-This function reads the inout pgm file of P5 format and stores the pixel data in a matrix A, passes it back to the calling program
+Reads the header of a pgm file opened in binary mode.
+Input : f - file object positioned at the start of the file
+Output: magicNumber, columns, rows, maxGray
+        On return, f is positioned at the first byte of the pixel data.
+        Bitmap (P1, P4) headers have no maxGray field, maxGray=1 is returned for them.
+Logic : Header fields are separated by whitespace and may be spread over one or more lines.
+        A '#' starts a comment that runs till the end of the line, anywhere in the header.
+        Exactly one whitespace character separates maxGray from the pixel data, so the header is
+        consumed byte by byte to avoid reading into the pixel data.
 '''
-def readfile(filename):
-    m=[]                     # list to store the matrix
+def readHeader(f):
     headers=[]               # list to store header informantion
-    print("columns=",config.columns,"rows=",config.rows,"maxGray=",config.maxGray)
+    token=b''                # header field currently being read
+
+    fields=4                 # number of header fields
+
+    while len(headers)<fields: # obtain the magic number, column, row and max gray header informations
+        c=f.read(1)
+        if c == b'':         # end of file reached before all header informations are found
+            sys.exit("invalid PGM format")
+        if c == b'#':        # skip comment till end of line
+            f.readline()
+            c=b'\n'
+        if c.isspace():
+            if token:        # whitespace ends the current header field
+                headers.append(token)
+                token=b''
+                if headers==[b'P1'] or headers==[b'P4']:
+                    fields=3 # bitmaps have no max gray
+        else:
+            token+=c
+
     try:
-        f=open(filename,'rb')# read file in binary mode  
+        magicNumber=headers[0].decode('ascii')
+        columns,rows,maxGray=list(map(int,headers[1:]))+[1]*(4-fields)
     except:
         sys.exit("invalid PGM format")
+    return magicNumber,columns,rows,maxGray
 
-    while len(headers)<4:    # obtain the magic number, column, row and max gray header informations from same of different lines
-        header = readnextUncommentedLine(f) # keep reading uncommneted lines until all 4 header informations are obtained
-        headers.extend(header.split())
-
-    magicNumber = headers[0].decode('ascii')
-    config.columns,config.rows,config.maxGray=list(map(int,headers[1:]))
-    print("magicNumber=",magicNumber,"columns=",config.columns,"rows=",config.rows,"maxGray=",config.maxGray)
-    
-    if magicNumber=='P5':
-        print("it's P5 file!")
-        for line in f:
-            for b in line:
-                m.append(b)  # read all pixel values in a list
-        f.close()
-        config.A=np.array(m).reshape(config.rows,config.columns) # create numpy array
-            
-    else:
+'''
+Maps the pixel data of a P5 pgm file to a numpy memmap, without reading the pixels into memory.
+Inputs: filename - name of the P5 file
+        startRow - first row to be mapped, default 0
+        endRow   - row after the last row to be mapped, default number of rows in the image
+Output: A       - read-only memmap of shape (endRow-startRow) x columns. Pixels are read from disk only
+                  when they are accessed, so downstream code can touch only the rows it needs.
+                  dtype is uint8, or big-endian uint16 if maxGray > 255
+        maxGray - maximum intensity possible in the image
+'''
+def mapfile(filename,startRow=0,endRow=None):
+    try:
+        f=open(filename,'rb')# read file in binary mode
+    except:
+        sys.exit("invalid PGM format")
+
+    with f:
+        magicNumber,columns,rows,maxGray=readHeader(f)
+        offset=f.tell()      # pixel data starts right after the header
+
+    if magicNumber!='P5':
         sys.exit("invalid PGM file")
 
-  
+    if endRow is None:
+        endRow=rows
+    if not 0<=startRow<=endRow<=rows:
+        sys.exit("invalid row range "+str(startRow)+":"+str(endRow))
+
+    dtype=np.dtype(np.uint8) if maxGray<256 else np.dtype('>u2')  # 2 bytes per pixel, most significant byte first, if maxGray > 255
+    if endRow==startRow:     # numpy can not map an empty range
+        return np.zeros((0,columns),dtype=dtype),maxGray
+
+    A=np.memmap(filename,dtype=dtype,mode='r',offset=offset+startRow*columns*dtype.itemsize,shape=(endRow-startRow,columns))
+    return A,maxGray
+
+'''
+This function reads the inout pgm file of P5 format and stores the pixel data in a matrix A, passes it back to the calling program
+The matrix is a read-only memmap over the pixel data of the file, so no pixel is copied until it is used.
+'''
+def readfile(filename):
+    config.A,config.maxGray=mapfile(filename)
+    config.rows,config.columns=config.A.shape
+    print("magicNumber= P5 columns=",config.columns,"rows=",config.rows,"maxGray=",config.maxGray)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import tempfile
+import subprocess
+import numpy as np
+from matrix_to_binary import creatBinaryeFile
+from matrix_to_ascii import createASCIIFile
+
+'''
+Rerun checks of batchSegmentation.py: running the driver again over a directory that also holds its outputs must
+skip the inputs already processed and must not take its own outputs as new inputs.
+Run directly (python test_batchSegmentation.py) or with pytest.
+'''
+
+script=os.path.join(os.path.dirname(os.path.abspath(__file__)),'batchSegmentation.py')
+rng=np.random.default_rng(0)
+
+'''
+Run the driver in directory cwd, return its summary line
+'''
+def runDriver(cwd,*args):
+    proc=subprocess.run([sys.executable,script,'-j','2']+list(args),cwd=cwd,capture_output=True,text=True)
+    assert proc.returncode==0,proc.stderr
+    return [line for line in proc.stdout.splitlines() if line.startswith('processed')][-1]
+
+def pgmFiles(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.pgm'))
+
+def test_segment_rerun():
+    for check in ('mtime','hash'):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ('a.pgm','b.pgm'):
+                creatBinaryeFile(os.path.join(tmp,name),rng.integers(0,256,(20,30),dtype=np.uint8),20,30,255)
+            assert runDriver(tmp,'-c',check,'.').startswith('processed 2, skipped 0, failed 0')
+            files=pgmFiles(tmp)
+            assert len(files)==8                              # 2 inputs and 3 segmented images of each
+            for run in range(2):
+                assert runDriver(tmp,'-c',check,'.').startswith('processed 0, skipped 2, failed 0')
+                assert pgmFiles(tmp)==files
+
+def test_convert_rerun():
+    with tempfile.TemporaryDirectory() as tmp:
+        createASCIIFile(rng.integers(0,256,(20,30)),20,30,255,os.path.join(tmp,'c_ASCII.pgm'))
+        assert runDriver(tmp,'-t','convert','.').startswith('processed 1, skipped 0, failed 0')
+        assert pgmFiles(tmp)==['c.pgm','c_ASCII.pgm']
+        assert runDriver(tmp,'-t','convert','.').startswith('processed 0, skipped 1, failed 0') # c.pgm is an output
+
+if __name__=='__main__':
+    tests=[f for name,f in sorted(globals().items()) if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(test.__name__,'passed')
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import struct
+import numpy as np
+from bitPlaneCompression import (encodePlane,decodePlane,compressImage,decompressImage,headerFormat,headerSize,
+                                 rawFlag,entropyFlag)
+
+'''
+Round-trip checks of bitPlaneCompression: every encoded plane or image must decode to exactly the input.
+Run directly (python test_bitPlaneCompression.py) or with pytest.
+Column counts that are not a multiple of 8 are used throughout, so the padding of packed rows is exercised.
+'''
+
+rng=np.random.default_rng(0)
+
+'''
+Flags of an encoded plane, from its header
+'''
+def flagsOf(data):
+    return struct.unpack(headerFormat,data[:headerSize])[1]
+
+'''
+Encode a plane of bits with and without entropy coding, from the unpacked and the packed form, and check the decoded
+plane in both forms. Returns the flags of each encoding.
+'''
+def roundTrip(bits):
+    rows,columns=bits.shape
+    packed=np.packbits(bits,axis=1)
+    flags=[]
+    for entropy in (True,False):
+        for data in (encodePlane(bits,entropy=entropy),encodePlane(packed,columns,entropy)):
+            assert np.array_equal(decodePlane(data),bits)
+            assert np.array_equal(decodePlane(data,packed=True),packed)
+            flags.append(flagsOf(data))
+    return flags
+
+def test_8bit_image():
+    A=rng.integers(0,256,(61,53),dtype=np.uint8)
+    A[:30]=A[:30]&0xF0                                    # long runs in the low planes of the top half
+    for entropy in (True,False):
+        encoded=compressImage(A,entropy)
+        assert len(encoded)==8
+        B=decompressImage(encoded)
+        assert B.dtype==np.uint8 and np.array_equal(B,A)
+
+def test_16bit_image():
+    A=rng.integers(0,65536,(37,45),dtype=np.uint16)
+    A[::2]>>=8                                            # every other row has zero high bits
+    for entropy in (True,False):
+        encoded=compressImage(A,entropy)
+        assert len(encoded)==16
+        assert np.array_equal(decompressImage(encoded),A)
+
+def test_all_zero_plane():
+    bits=np.zeros((40,33),dtype=np.uint8)
+    flags=roundTrip(bits)
+    assert all(not f&rawFlag for f in flags)              # a single run of 0s
+    assert np.array_equal(decompressImage(compressImage(np.zeros((40,33),dtype=np.uint8))),np.zeros((40,33)))
+
+def test_all_one_plane():
+    bits=np.ones((40,33),dtype=np.uint8)
+    flags=roundTrip(bits)
+    assert all(not f&rawFlag for f in flags)              # an empty run of 0s, then a single run of 1s
+    A=np.full((40,33),255,dtype=np.uint8)
+    assert np.array_equal(decompressImage(compressImage(A)),A)
+
+def test_raw_fallback_plane():
+    bits=np.zeros((32,27),dtype=np.uint8)
+    bits[:,1::2]=1                                        # runs of length 1: run-length encoding can not help
+    bits^=rng.integers(0,2,bits.shape,dtype=np.uint8)&rng.integers(0,2,bits.shape,dtype=np.uint8)
+    flags=roundTrip(bits)
+    assert flags[2]==rawFlag and flags[3]==rawFlag        # without entropy coding the plane is stored packed
+    assert all(f in (rawFlag,entropyFlag) for f in flags)
+
+def test_single_pixel_planes():
+    for value in (0,1):
+        assert roundTrip(np.full((1,1),value,dtype=np.uint8))
+
+if __name__=='__main__':
+    tests=[f for name,f in sorted(globals().items()) if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(test.__name__,'passed')
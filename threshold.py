@@ -2,22 +2,64 @@ import sys
 import config
 import numpy as np
 from statistics import mean,stdev
-from histogram import normalise,plotHistogram
+from histogram import plotHistogram
 
 '''
-Threshold an image based on a single threshold
+Threshold an image matrix A based on one or many thresholds, without touching the global variables in config
+Inputs: A          - image matrix
+        thresholds - list of thresholds. A pixel gets label i if it is more than i of the thresholds
+        levels     - optional list of output intensities, one for each label. Default: the labels 0,1,...,len(thresholds)
+        out        - optional preallocated output matrix of A's shape, e.g. an uint8 buffer reused across images
+Output: label map (or intensity map if levels are given) of A's shape
+Logic : For 8-bit and 16-bit images, a look up table with the output for each possible intensity is built
+        with np.digitize, and applied to all pixels in one np.take pass. Other images are digitized directly.
 '''
-def applySingleThreshold(T):
+def applyThresholds(A,thresholds,levels=None,out=None):
+    A=np.asarray(A)
+    thresholds=np.sort(np.asarray(thresholds,dtype=float))  # np.digitize needs increasing thresholds
+    if levels is None:
+        levels=np.arange(len(thresholds)+1)
+    levels=np.asarray(levels)
+    dtype=out.dtype if out is not None else (np.uint8 if levels.max()<256 else np.uint16)
+
+    if A.dtype.kind=='u' and A.dtype.itemsize<=2:           # 8-bit or 16-bit, in any byte order
+        lut=levels[np.digitize(np.arange(256**A.dtype.itemsize),thresholds,right=True)].astype(dtype) # output for each possible intensity
+        return np.take(lut,A,out=out)
+
+    SA=levels[np.digitize(A,thresholds,right=True)]         # right=True: label counts thresholds strictly less than the pixel
+    if out is None:
+        return SA.astype(dtype)
+    out[...]=SA
+    return out
+
+'''
+Threshold an image matrix A based on a single threshold T, without touching the global variables in config.
+Pixels with intensity > T are white (255), others are black (0). out is an optional preallocated uint8 output matrix.
+'''
+def applyThreshold(A,T,out=None):
+    return applyThresholds(A,[T],[0,255],out)
 
-    SA=np.zeros((config.rows,config.columns),dtype=int)
-    for i in range(config.rows):
-        for j in range(config.columns):
-            if config.A[i,j]>T:         # pixel is white if intensity > L/2
+'''
+Earlier pixel by pixel version of applyThreshold, kept for benchmarking
+'''
+def applyThreshold_old(A,T):
+
+    rows,columns=A.shape
+    SA=np.zeros((rows,columns),dtype=int)
+    for i in range(rows):
+        for j in range(columns):
+            if A[i,j]>T:          # pixel is white if intensity > T
                 SA[i,j]=255
             else:
-                SA[i,j]=0         # pixel is black if intensity <= L/2
+                SA[i,j]=0         # pixel is black if intensity <= T
     return SA
 
+'''
+Threshold an image based on a single threshold
+'''
+def applySingleThreshold(T):
+    return applyThreshold(config.A,T)
+
 '''
 Threshold an image based on a L/2
 '''
@@ -63,57 +105,200 @@ def expectation(X,normal=0,start=0,end=0):
     else:
         return SumxP/SumP
 
+'''
+Calculate cumulative sums of a histogram, so that count and expectation of any range of intensities is O(1)
+Inputs: hist : 1-D histogram
+Output: P : P[i] = sum(hist[0:i+1]), number of pixels with intensity <= i
+        M : M[i] = sum(x.hist[x]) for x in 0 to i, first moment of intensities <= i
+'''
+def cumulativeMoments(hist):
+    hist=np.asarray(hist,dtype=float)
+    P=np.cumsum(hist)
+    M=np.cumsum(np.arange(len(hist))*hist)
+    return P,M
 
 '''
-Threshold an image based on a mean of mean.
+Expectation of the intensities start to end (both inclusive) from cumulative sums of a histogram.
+Same as expectation(hist,0,start,end), including its default: end=0 means the last intensity.
+'''
+def rangeExpectation(P,M,start=0,end=0):
+    if end == 0:
+        end = len(P)-1
+    if end < start:
+        return 0
+    SumP = P[end]-(P[start-1] if start>0 else 0)
+    SumxP = M[end]-(M[start-1] if start>0 else 0)
+    if SumP == 0:
+        return 0
+    return SumxP/SumP
+
+'''
+Calculate threshold based on a mean of mean, from a histogram with maxGray+1 intensity levels.
 Starting threshold T= L/2, calculate means m1, m2 of intensities lower and higher then T.
 new T= (m1+m2)/2
 Repeat recalculating until dT < a given number
+Optional P, M: cumulative sums of hist from cumulativeMoments, if already calculated
 '''
 
-def thresholdMeanOfMeans(Trange=1):
-    T= config.maxGray                  # initialise threshold = L/2
+def meanOfMeansThreshold(hist,maxGray,Trange=1,P=None,M=None):
+    if P is None:
+        P,M=cumulativeMoments(hist)    # each iteration below is then O(1)
+    T= maxGray                         # initialise threshold = L/2
     T >>= 1    
     Told=0                             # threshold obtained from previous iteration. Initialised to 0.
 
     while (abs(T-Told)>Trange):        # iterate until difference between new and old threshold is less than provided Trange      
                       
-        m1 = expectation(config.hist,0,0,int(T)) # calculate expectation of config.hist[0:T+1],0-> histogram not normalised,0->start index,T->end index
-        m2 = expectation(config.hist,0,int(T)+1) # calculate expectation of config.hist[T+1:],0-> histogram not normalised,T+1->start index
+        m1 = rangeExpectation(P,M,0,int(T)) # calculate expectation of hist[0:T+1],0->start index,T->end index
+        m2 = rangeExpectation(P,M,int(T)+1) # calculate expectation of hist[T+1:],T+1->start index
 
         Told=T                         # threshold obtained from previous iteration. 
         T=(m1+m2)/2                    # new threshold = mean of m1 and m2
 
+    return T
+
+'''
+Threshold an image based on a mean of mean.
+'''
+
+def thresholdMeanOfMeans(Trange=1):
+    T=meanOfMeansThreshold(config.hist,config.maxGray,Trange)
     print("final threshold (mean of means) = ",T)
     return (applySingleThreshold(T))   # return matrix after applying threshold 
 
 
 '''
-Decide threshold based on Otsu's method
+Inter-class variance of Otsu's method for every hypothesis threshold, from cumulative sums of a histogram
+Inputs: P, M : cumulative sums from cumulativeMoments
+Output: s : s[i] = inter-class variance when intensities <= i are one class and intensities > i the other.
+            s[i] = 0 when one of the classes is empty
+Logic : with p = P/total, m1 = M/total and m = mean intensity of the image, s = (m1-m*p)^2/(p*(1-p)),
+        calculated for all thresholds at once
 '''
+def otsuVariance(P,M):
+    total=P[-1]
+    if total == 0:
+        return np.zeros(len(P))
+    p=P/total
+    m1=M/total
+    m=m1[-1]
+    den=p*(1-p)
+    s=np.zeros(len(P))
+    np.divide(np.square(m1-m*p),den,out=s,where=den>1e-12) # p=0 or p=1 -> one class is empty
+    return s
 
-def thresholdOtsu():
+'''
+Decide threshold based on Otsu's method, from a histogram
+Output: threshold, inter-class variances for each hypothesis threshold
+'''
 
-    H=normalise(config.hist)
+def otsuThreshold(hist,P=None,M=None):
+    if P is None:
+        P,M=cumulativeMoments(hist)
+    splot=otsuVariance(P,M)
+    k = int(np.argmax(splot))           # The intensity where inter class variance is maximum, is the threshold  
+    return k,splot
 
-    m = expectation(H)                 # Calculate mean intensity of the whole image
-    p = H[0]                           # stores sum(p(x)) for current hypothesis threshold i in the loop
-    m1 = 0                             # stores sum(xp(x)) for current hypothesis threshold i in the loop
-    s=0                                # inter-class variance for the for current hypothesis threshold i in the loop
-    splot=[]                           # list of inter-class variances for plotting
-    
-    for i in range(1,len(H)):          # For each possible threshold, calculate inter class variance      
-                      
-        p += H[i]                      # include p(i) in the running sum 
-        m1 += i*H[i]                   # include i*p(i) in the running sum
+'''
+Threshold an image based on Otsu's method
+Inputs: diagnostics : if True, the inter-class variance for each hypothesis threshold is returned along with the image,
+                      default False
+        plotfile    : optional file name to save the plot of inter-class variance against intensity, e.g. 'variance.png'.
+                      Default 0: nothing is plotted or written, and matplotlib is not loaded.
+Output: segmented image matrix, or (segmented image matrix, inter-class variances) if diagnostics is True
+'''
 
-        if p!=0 and p!= 1:
-            s=(m1-m*p)**2/(p*(1-p))
-        splot.append(s)
+def thresholdOtsu(diagnostics=False,plotfile=0):
+
+    k,splot=otsuThreshold(config.hist)
+    if plotfile != 0:
+        plotHistogram(splot,plotfile,'inter-class variance') # plot interclass variance against intensity
 
-    plotHistogram(splot,'variance.png','inter-class variance') # plot interclass variance against intensity
-    
-    k = splot.index(max(splot))         # The intensity where inter class variance is maximum, is the threshold  
     print("final threshold (Otsu)= ",k)
-    return (applySingleThreshold(k))    # return matrix after applying threshold 
+    SA=applySingleThreshold(k)          # matrix after applying threshold
+    if diagnostics:
+        return SA,splot
+    return SA
+
 
+
+'''
+Multi-level Otsu's method: thresholds that split a histogram into k classes with maximum inter-class variance
+Inputs: hist    : 1-D histogram
+        classes : number of classes k, at least 2
+        P, M    : optional cumulative sums of hist from cumulativeMoments
+Output: sorted list of k-1 thresholds, to be used with applyThresholds
+Logic : maximising inter-class variance is same as maximising sum(M_c^2/P_c) over classes c, where P_c and M_c
+        are count and first moment of the class, each O(1) from cumulative sums. The best split of intensities
+        0..j into c classes is found by dynamic programming over c, each step vectorized over all (i,j) pairs.
+        Histograms with more than 1024 levels (16-bit images) are first merged into 1024 bins.
+'''
+def multiOtsuThresholds(hist,classes,P=None,M=None):
+    if classes < 2:
+        sys.exit("multi-level Otsu needs at least 2 classes")
+    if P is None:
+        P,M=cumulativeMoments(hist)
+
+    step=-(-len(P)//1024)                    # number of intensity levels merged into one bin
+    last=np.minimum(np.arange(step-1,len(P)+step-1,step),len(P)-1) # last intensity level of each bin
+    P=P[last]                                # cumulative sums at the end of each bin
+    M=M[last]
+    L=len(P)
+    if classes > L:
+        sys.exit("more classes than intensity levels")
+
+    P0=np.concatenate(([0],P))               # P0[j]-P0[i] = count of bins i to j-1
+    M0=np.concatenate(([0],M))
+    w=P0[None,:]-P0[:,None]                  # w[i,j] : count of the class with bins i..j-1
+    mu=M0[None,:]-M0[:,None]
+    score=np.zeros((L+1,L+1))
+    np.divide(np.square(mu),w,out=score,where=w>0)
+    score[np.tril_indices(L+1)]=-np.inf      # a class needs at least one bin: i < j
+
+    best=score[0]                            # best[j] : best score of bins 0..j-1 in one class
+    back=[]
+    for c in range(1,classes):               # best score of bins 0..j-1 in c+1 classes
+        total=best[:,None]+score
+        back.append(np.argmax(total,axis=0)) # start bin of the last class
+        best=total[back[-1],np.arange(L+1)]
+
+    thresholds=[]
+    j=L
+    for c in reversed(back):                 # backtrack start bins of classes, last class first
+        j=c[j]
+        thresholds.append(int(j*step-1))     # last intensity of the previous class
+    return sorted(thresholds)
+
+'''
+Compute thresholds L/2, mean of means and Otsu (and optionally multi-level Otsu) from one histogram
+Inputs: hist    : 1-D histogram
+        maxGray : maximum intensity possible in the image
+        Trange  : convergence limit for mean of means, default 1
+        classes : number of classes for multi-level Otsu, default 0 (not calculated)
+Output: dictionary with keys 'half', 'mom', 'otsu' (and 'multiOtsu' with a list of thresholds)
+Logic : cumulative sums of the histogram are calculated once, all thresholds are then derived in O(L)
+'''
+def selectThresholds(hist,maxGray,Trange=1,classes=0):
+    P,M=cumulativeMoments(hist)
+    thresholds={'half':maxGray/2,
+                'mom':meanOfMeansThreshold(hist,maxGray,Trange,P,M),
+                'otsu':otsuThreshold(hist,P,M)[0]}
+    if classes:
+        thresholds['multiOtsu']=multiOtsuThresholds(hist,classes,P,M)
+    return thresholds
+
+'''
+Segment an image with several single thresholds in one pass over the pixels
+Inputs: A          : 8-bit or 16-bit image matrix
+        thresholds : list of thresholds, e.g. list(selectThresholds(...).values()) without 'multiOtsu'
+Output: len(thresholds) x rows x columns uint8 array, SA[i] = 255 where A > thresholds[i], 0 otherwise
+Logic : one look up table per threshold is stacked, and all tables are applied with a single np.take.
+        Each SA[i] is contiguous, so it can be written to a file without a copy.
+'''
+def segmentAll(A,thresholds):
+    A=np.asarray(A)
+    if A.dtype.kind!='u' or A.dtype.itemsize>2:
+        A=A.astype(np.uint16)
+    levels=np.arange(256**A.dtype.itemsize)
+    lut=np.where(levels[None,:]>np.asarray(thresholds,dtype=float)[:,None],255,0).astype(np.uint8)
+    return np.take(lut,A,axis=1)
@@ -1,10 +1,8 @@
-import cv2 as cv
-import os
+from batchConvert import main
 
+'''
+Converts all images of the current directory (or of the directories given on the command line) to gray and writes
+them with _Grey appended to the original name. Options: see batchConvert.py
+'''
 if __name__=='__main__':
-    files = [f for f in os.listdir('.') if os.path.isfile(f)]
-    for filename in files:
-        img=cv.imread(filename)
-        if img is not None:
-            oimg=cv.cvtColor(img, cv.COLOR_BGR2GRAY)
-            cv.imwrite(filename[:-4]+'_Grey'+filename[-4:],oimg)
+    main('grey')
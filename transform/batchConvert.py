@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+import argparse
+import cv2 as cv
+from concurrent.futures import ProcessPoolExecutor,wait,FIRST_COMPLETED
+
+'''
+Batch conversion of image files in parallel worker processes: to gray (ConvertColor2Grey.py) or to jpg
+(convert_to_jpg_all.py).
+
+Usage: batchConvert.py [-t grey|jpg] [-o output_dir] [-r] [-j workers] [-f] [input ...]
+       input : files or directories, default the current directory
+       -r    : include files in subdirectories (the directory tree is kept under output_dir)
+       -f    : convert again files whose output is newer than the input (skipped by default)
+Only files that start with the signature (magic bytes) of an image format are decoded, other files are never opened
+by OpenCV. At most 2 files per worker are queued at a time, so memory stays bounded for any number of files. A file
+that cannot be decoded is reported and the batch continues. At the end, the time spent decoding, converting and
+encoding (summed over the workers) is reported.
+'''
+
+signatures=[(b'\xff\xd8\xff','jpg'),                    # magic bytes at the start of image files
+            (b'\x89PNG\r\n\x1a\n','png'),
+            (b'BM','bmp'),
+            (b'II*\x00','tif'),
+            (b'MM\x00*','tif'),
+            (b'\x00\x00\x00\x0cjP  \r\n\x87\n','jp2')]
+pnmMagic=[b'P1',b'P2',b'P3',b'P4',b'P5',b'P6']          # portable any map, followed by white space
+
+suffixes={'grey':'_Grey'}                               # appended to the name of output files
+extensions={'jpg':'.jpg'}                               # extension of output files, default same as input
+defaultOutput={'jpg':'JPG'}                             # default output directory, default same as input
+
+'''
+Type of an image file from its first bytes, or None if it is not an image file OpenCV can read
+'''
+def imageType(filename):
+    try:
+        with open(filename,'rb') as f:
+            head=f.read(16)
+    except OSError:
+        return None
+    for magic,kind in signatures:
+        if head.startswith(magic):
+            return kind
+    if head[:2] in pnmMagic and head[2:3].isspace():
+        return 'pnm'
+    if head[:4]==b'RIFF' and head[8:12]==b'WEBP':
+        return 'webp'
+    return None
+
+'''
+Image files of the inputs (files or directories), with the directory each one is relative to
+'''
+def collectFiles(inputs,recursive=False,exclude=None):
+    files=[]
+    for item in inputs:
+        if os.path.isfile(item):
+            files.append((item,os.path.dirname(item)))
+            continue
+        for root,dirs,names in os.walk(item):
+            if exclude:
+                dirs[:]=[d for d in dirs if os.path.abspath(os.path.join(root,d))!=exclude]
+            files.extend((os.path.join(root,name),item) for name in sorted(names))
+            if not recursive:
+                break
+    return [(f,top) for f,top in files if imageType(f)]
+
+'''
+Name of the output file of one input file; the directory tree under top is kept under outdir
+'''
+def outputName(task,filename,top,outdir):
+    base,xtn=os.path.splitext(os.path.relpath(filename,top or '.'))
+    name=base+suffixes.get(task,'')+extensions.get(task,xtn)
+    return os.path.join(outdir if outdir else top,name)
+
+def isOutput(task,filename):
+    return task in suffixes and os.path.splitext(filename)[0].endswith(suffixes[task])
+
+def initWorker():
+    cv.setNumThreads(1)                                 # one OpenCV thread per process, the pool uses the cores
+
+'''
+Convert one file in a worker process
+Output: size of the input in bytes, and seconds spent decoding, converting and encoding
+'''
+def processFile(task,filename,output):
+    start=time.perf_counter()
+    img=cv.imread(filename)
+    if img is None:
+        raise ValueError("could not decode the image")
+    decoded=time.perf_counter()
+    if task=='grey':
+        img=cv.cvtColor(img,cv.COLOR_BGR2GRAY)
+    converted=time.perf_counter()
+    os.makedirs(os.path.dirname(output) or '.',exist_ok=True)
+    if not cv.imwrite(output,img):
+        raise ValueError("could not write "+output)
+    return os.path.getsize(filename),decoded-start,converted-decoded,time.perf_counter()-converted
+
+'''
+Convert all image files of the inputs
+Inputs: task      : 'grey' or 'jpg'
+        inputs    : files or directories
+        outdir    : output directory, default defaultOutput of the task, or next to each input file
+        recursive : include subdirectories
+        workers   : number of worker processes, default number of processors
+        force     : convert files whose output is up to date too
+Output: numbers of converted, skipped and failed files
+'''
+def convertAll(task,inputs,outdir=None,recursive=False,workers=None,force=False):
+    outdir=outdir or defaultOutput.get(task)
+    exclude=os.path.abspath(outdir) if outdir else None
+    files=[(f,top) for f,top in collectFiles(inputs,recursive,exclude) if not isOutput(task,f)]
+    print(len(files),'image files found')
+
+    workers=workers or os.cpu_count()
+    start=time.perf_counter()
+    done=failed=skipped=nbytes=0
+    stages=[0.0,0.0,0.0]                                # decode, convert, encode
+    pending={}
+
+    def collect(futures):
+        nonlocal done,failed,nbytes
+        for future in futures:
+            filename=pending.pop(future)
+            try:
+                size,*times=future.result()
+            except Exception as e:                      # a bad file does not stop the batch
+                failed+=1
+                print(filename,': failed -',e)
+                continue
+            done+=1
+            nbytes+=size
+            for k in range(3):
+                stages[k]+=times[k]
+
+    with ProcessPoolExecutor(max_workers=workers,initializer=initWorker) as executor:
+        for filename,top in files:
+            output=outputName(task,filename,top,outdir)
+            if not force and os.path.exists(output) and os.path.getmtime(output)>=os.path.getmtime(filename):
+                skipped+=1
+                continue
+            if len(pending)>=2*workers:                 # bounded queue of submitted files
+                finished,running=wait(pending,return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending[executor.submit(processFile,task,filename,output)]=filename
+        collect(list(pending))
+
+    elapsed=time.perf_counter()-start
+    print("converted %d, skipped %d, failed %d files in %.2f s" %(done,skipped,failed,elapsed))
+    if done:
+        print("decode %.2f s, convert %.2f s, encode %.2f s (total over workers)" %tuple(stages))
+        if elapsed>0:
+            print("throughput: %.1f images/s, %.1f MB/s" %(done/elapsed,nbytes/2**20/elapsed))
+    return done,skipped,failed
+
+def main(task=None):
+    parser=argparse.ArgumentParser(description='Convert many image files in parallel')
+    if task is None:
+        parser.add_argument('-t','--task',choices=['grey','jpg'],default='grey')
+    parser.add_argument('inputs',nargs='*',default=['.'],help='files or directories, default current directory')
+    parser.add_argument('-o','--output',help='output directory')
+    parser.add_argument('-r','--recursive',action='store_true',help='include subdirectories')
+    parser.add_argument('-j','--workers',type=int,help='number of worker processes')
+    parser.add_argument('-f','--force',action='store_true',help='convert files already converted too')
+    args=parser.parse_args()
+    done,skipped,failed=convertAll(task or args.task,args.inputs,args.output,args.recursive,args.workers,args.force)
+    if failed:
+        sys.exit(1)
+
+if __name__=='__main__':
+    main()
@@ -3,8 +3,15 @@ import numpy as np
 
 '''
 This module contains methods related to color code conversion of color images.
+
+RGB2CMYK, CMYK2RGB, RGB2HSI and HSI2RGB convert an image in tiles of rows, so the float32 work buffers (allocated once,
+reused for every tile) stay in the processor cache, and use broadcasting instead of replicating channels with dstack.
+The earlier whole-image versions are kept with the suffix _old.
+Color images are in OpenCV channel order (blue, green, red).
 '''
 
+tileBytes=1<<20                      # size of a float32 work buffer of one tile
+
 def RGB2XYZ(imgRGB):
     '''
     Normalise RGB colors
@@ -69,14 +76,14 @@ def CMYK2CMY(imgCMYK):
     K1=np.ones(K.shape)-K         # Calculate 1-K
     return imgCMYK[:,:,:3]*K1+K   # C=C*(1-K)+K, M=M*(1-K)+K, Y=Y*(1-K)+K
 
-def RGB2CMYK(img):
+def RGB2CMYK_old(img):
     '''
     Convert from RGB to CMYK
     '''
 
     return CMY2CMYK(RGB2CMY(img)) # RGB -> CMY -> CMYK
 
-def CMYK2RGB(img):
+def CMYK2RGB_old(img):
     '''
     Convert from CMYK to RGB
     '''
@@ -84,7 +91,7 @@ def CMYK2RGB(img):
     kimg=np.round(255*CMY2RGB(CMYK2CMY(img))).astype(np.uint8) # CMYK -> CMY -> RGB
     return  kimg
 
-def RGB2HSI(imgRGB):
+def RGB2HSI_old(imgRGB):
     '''
     Convert from RGB color code to HSI color code
     I=(R+G+B)/3,               Intensity
@@ -111,7 +118,7 @@ def RGB2HSI(imgRGB):
 
     return np.dstack([h,s,i])                       # create hsi image and return
 
-def HSI2RGB(imgHSI):
+def HSI2RGB_old(imgHSI):
     '''
     Convert from HSI color code to RGB color code
     '''
@@ -147,3 +154,174 @@ def HSI2RGB(imgHSI):
     rgbimg=rgbimg.astype(np.uint8)
     
     return rgbimg
+
+def _tileRows(columns,channels=3):
+    '''
+    Number of rows in a tile, so that a float32 buffer of a tile with the given number of channels is about tileBytes
+    '''
+    return max(1,tileBytes//(4*channels*max(1,columns)))
+
+def RGB2CMYK(img,out=None):
+    '''
+    Convert from RGB to CMYK
+    C = 1 - R, M = 1 - G, Y = 1 - B, K = min(C,M,Y),
+    if K=1, C=M=Y=0
+    else, C=(C-K)/(1-K), M=(M-K)/(1-K), Y=(Y-K)/(1-K)
+    img : rows x columns x 3 image, gray values 0-255
+    out : optional rows x columns x 4 float32 output
+    '''
+    rows,columns=img.shape[:2]
+    if out is None:
+        out=np.empty((rows,columns,4),dtype=np.float32)
+    n=_tileRows(columns)
+    K1=np.empty((n,columns,1),dtype=np.float32)       # 1-K, broadcast over the 3 channels
+
+    for start in range(0,rows,n):
+        end=min(start+n,rows)
+        CMY=out[start:end,:,:3]
+        K=out[start:end,:,3]
+        one=K1[:end-start]
+        np.multiply(img[start:end],np.float32(-1/255),out=CMY,casting='unsafe')
+        CMY+=1                                        # CMY = 1-RGB/255
+        np.minimum(CMY[...,0],CMY[...,1],out=K)       # minimum of C,M,Y is to be mixed to Black(K)
+        np.minimum(K,CMY[...,2],out=K)
+        CMY-=K[...,None]
+        np.subtract(1,K[...,None],out=one)
+        np.divide(CMY,one,out=CMY,where=one!=0)       # if K=1, C,M,Y are already 0
+    return out
+
+def CMYK2RGB(img,out=None):
+    '''
+    Convert from CMYK to RGB
+    R = 255*(1-C)*(1-K), and same for G, B (CMYK -> CMY -> RGB)
+    out : optional rows x columns x 3 uint8 output
+    '''
+    rows,columns=img.shape[:2]
+    if out is None:
+        out=np.empty((rows,columns,3),dtype=np.uint8)
+    n=_tileRows(columns)
+    work=np.empty((n,columns,3),dtype=np.float32)
+    K1=np.empty((n,columns,1),dtype=np.float32)
+
+    for start in range(0,rows,n):
+        end=min(start+n,rows)
+        rgb=work[:end-start]
+        one=K1[:end-start]
+        np.subtract(1,img[start:end,:,3:],out=one,casting='unsafe') # 1-K
+        np.subtract(1,img[start:end,:,:3],out=rgb,casting='unsafe') # 1-C, 1-M, 1-Y
+        rgb*=one
+        rgb*=255
+        np.rint(rgb,out=rgb)
+        np.clip(rgb,0,255,out=rgb)
+        out[start:end]=rgb
+    return out
+
+def RGB2HSI(imgRGB,out=None):
+    '''
+    Convert from RGB color code to HSI color code
+    I=(R+G+B)/3,               Intensity
+    S=1-3*min(R,G,B)/(R+G+B),  Saturation (0 for black pixels)
+    H=    t, if B <= G,        Hue (0 for gray pixels)
+      360-t, otherwise
+    where Cos(t)=[(R-G)+(R-B)]/2[(R-G)^2+(R-B)(G-B)]^(1/2)
+    out : optional rows x columns x 3 float32 output
+    '''
+    rows,columns=imgRGB.shape[:2]
+    if out is None:
+        out=np.empty((rows,columns,3),dtype=np.float32)
+    n=_tileRows(columns)
+    work=np.empty((n,columns,3),dtype=np.float32)    # b,g,r of a tile in float32
+    num=np.empty((n,columns),dtype=np.float32)
+    den=np.empty((n,columns),dtype=np.float32)
+    tmp=np.empty((n,columns),dtype=np.float32)
+
+    for start in range(0,rows,n):
+        end=min(start+n,rows)
+        m=end-start
+        bgr=work[:m]
+        bgr[...]=imgRGB[start:end]
+        b,g,r=bgr[...,0],bgr[...,1],bgr[...,2]
+        h,s,i=out[start:end,:,0],out[start:end,:,1],out[start:end,:,2]
+        nm,dn,tm=num[:m],den[:m],tmp[:m]
+
+        np.add(b,g,out=i)
+        i+=r
+        i/=3                                          # average intensity (r+g+b)/3
+        np.minimum(b,g,out=s)
+        np.minimum(s,r,out=s)
+        np.divide(s,i,out=s,where=i!=0)
+        np.subtract(1,s,out=s,where=i!=0)             # black pixels: min is 0, saturation stays 0
+
+        np.subtract(r,g,out=nm)
+        nm+=r
+        nm-=b                                         # numerator of Cos(t): 2r-g-b
+        np.subtract(r,g,out=tm)
+        np.square(tm,out=tm)
+        np.subtract(r,b,out=dn)
+        dn*=g-b
+        dn+=tm
+        np.sqrt(dn,out=dn)
+        dn*=2                                         # denominator of Cos(t)
+        np.divide(nm,dn,out=nm,where=dn!=0)
+        np.copyto(nm,1,where=dn==0)                   # gray pixels, t=0
+        np.clip(nm,-1,1,out=nm)                       # rounding can take Cos(t) just outside [-1,1]
+        np.arccos(nm,out=h)
+        np.degrees(h,out=h)
+        np.subtract(360,h,out=h,where=b>g)            # calculate hue of each pixel
+    return out
+
+_sectorChannels=np.array([[0,2,1],                   # channels (0 blue, 1 green, 2 red) that get x, y, z
+                          [2,1,0],                   # for hue sectors 0-120, 120-240, 240-360
+                          [1,0,2]])
+
+def HSI2RGB(imgHSI,out=None):
+    '''
+    Convert from HSI color code to RGB color code
+    In the hue sector of a pixel (0-120, 120-240 or 240-360 degrees), with h the hue minus the start of the sector:
+    x = I(1-S), y = I(1+S Cos(h)/Cos(60-h)), z = 3I-x-y
+    sector 0: B=x, R=y, G=z;  sector 1: R=x, G=y, B=z;  sector 2: G=x, B=y, R=z
+    out : optional rows x columns x 3 uint8 output
+    '''
+    rows,columns=imgHSI.shape[:2]
+    if out is None:
+        out=np.empty((rows,columns,3),dtype=np.uint8)
+    n=_tileRows(columns)
+    work=np.empty((n,columns,3),dtype=np.float32)    # h,s,i of a tile in float32, then x,y,z
+    rgb=np.empty((n,columns,3),dtype=np.float32)
+    sector=np.empty((n,columns),dtype=np.intp)
+    tmp=np.empty((n,columns),dtype=np.float32)
+
+    for start in range(0,rows,n):
+        end=min(start+n,rows)
+        m=end-start
+        hsi=work[:m]
+        hsi[...]=imgHSI[start:end]
+        h,s,i=hsi[...,0],hsi[...,1],hsi[...,2]
+        sc,tm=sector[:m],tmp[:m]
+
+        np.floor_divide(h,120,out=tm)
+        np.nan_to_num(tm,copy=False)                  # undefined hue is taken as sector 0
+        np.clip(tm,0,2,out=tm)
+        sc[...]=tm
+        tm*=-120
+        h+=tm                                         # hue within its sector
+        np.radians(h,out=h)
+        np.subtract(np.pi/3,h,out=tm)
+        np.cos(tm,out=tm)
+        np.cos(h,out=h)
+        h/=tm
+        h*=s                                          # S Cos(h)/Cos(60-h)
+        np.subtract(1,s,out=s)
+        s*=i                                          # x
+        h+=1
+        h*=i                                          # y
+        i*=3
+        i-=s
+        i-=h                                          # z
+        xyz=np.stack([s,h,i],axis=2)
+        np.put_along_axis(rgb[:m],_sectorChannels[sc],xyz,axis=2)
+
+        np.rint(rgb[:m],out=rgb[:m])
+        np.clip(rgb[:m],0,255,out=rgb[:m])
+        out[start:end]=rgb[:m]
+    return out
@@ -1,21 +1,8 @@
-import cv2 as cv
-import sys
-import os
-
+from batchConvert import main
 
+'''
+Converts all image files of the current directory (or of the directories given on the command line) to jpg format,
+and keeps them in a folder JPG. Options: see batchConvert.py
+'''
 if __name__=='__main__':
-
-    files = [f for f in os.listdir('.') if os.path.isfile(f)]
-    print('File list obtained:',files)
-    os.mkdir('JPG')
-    for file in files:
-        filename,xtn=file.split('.')
-        if xtn != 'py':
-            img=cv.imread(file)
-
-            if img is None:
-                sys.exit("Could not read the image.")
-
-            print("size of ",file," : ",img.shape)
-            cv.imwrite('JPG/'+filename+'.jpg',img)
-        
+    main('jpg')
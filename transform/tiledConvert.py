@@ -0,0 +1,52 @@
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+Tiled executor for image conversions (e.g. the functions of colorcode), for images too large to convert at once.
+
+The input is processed in strips of rows by a pool of threads (NumPy releases the GIL in its array operations, so the
+strips are converted in parallel on all cores). Each strip is written straight into its rows of a preallocated output
+array or of a memory-mapped .npy file, so besides the input and the output only a few strips are in memory at a time.
+The input itself can be memory-mapped (np.load(...,mmap_mode='r')).
+'''
+
+stripRows=256                  # default number of rows in a strip
+
+def convertTiled(convert,*inputs,out=None,outfile=None,rows=stripRows,workers=None,**kwargs):
+    '''
+    Apply a conversion to images strip by strip in parallel threads
+    convert  : function(strip of each input, ..., out=strip of the output, **kwargs), e.g. colorcode.RGB2HSI,
+               or a ufunc such as np.subtract to take the difference of two images
+    inputs   : one or more images with the same number of rows
+    out      : optional preallocated output
+    outfile  : optional name of a .npy file to create as memory-mapped output (ignored if out is given)
+    rows     : number of rows in a strip, default stripRows
+    workers  : number of threads, default number of processors
+    kwargs   : other keyword arguments passed to convert
+    Output   : the output array (the memmap if outfile is given)
+    '''
+    height=len(inputs[0])
+    if out is None:
+        probe=np.asarray(convert(*[x[:1] for x in inputs],**kwargs))   # shape and type of the output of one row
+        shape=(height,)+probe.shape[1:]
+        if outfile:
+            out=np.lib.format.open_memmap(outfile,mode='w+',dtype=probe.dtype,shape=shape)
+        else:
+            out=np.empty(shape,dtype=probe.dtype)
+
+    def strip(start):
+        end=min(start+rows,height)
+        convert(*[x[start:end] for x in inputs],out=out[start:end],**kwargs)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        list(executor.map(strip,range(0,height,rows)))    # list() raises the first error of a strip, if any
+    return out
+
+def preview(img,size=2048):
+    '''
+    View of every k-th row and column of an image, at most size pixels along each side, to plot a very large image
+    without reading all of it
+    '''
+    step=max(1,-(-max(img.shape[:2])//size))
+    return img[::step,::step]